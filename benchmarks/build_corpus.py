@@ -0,0 +1,35 @@
+import argparse
+import os
+import time
+
+from benchmarks.synthetic import chapter_data, fragment_data
+from ebl_ngrams import ChapterCorpus, FragmentCorpus
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure corpus build time versus number of workers."
+    )
+    parser.add_argument("--fragments", type=int, default=10000)
+    parser.add_argument("--chapters", type=int, default=100)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+
+    benchmarks = [
+        (FragmentCorpus, fragment_data(args.fragments)),
+        (ChapterCorpus, chapter_data(args.chapters)),
+    ]
+
+    print("corpus,documents,workers,seconds")
+    for corpus, data in benchmarks:
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            corpus(data, workers=workers)
+            seconds = time.perf_counter() - start
+            print(f"{corpus.__name__},{len(data)},{workers},{seconds:.3f}")
+
+
+if __name__ == "__main__":
+    main()
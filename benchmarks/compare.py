@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+Key = Tuple[str, int, str]
+
+
+def load_results(path: Path) -> Dict[Key, dict]:
+    report = json.loads(path.read_text())
+    return {
+        (result["corpus"], result["documents"], result["benchmark"]): result
+        for result in report["results"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark reports and flag regressions."
+    )
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown (or memory increase) that counts as a regression.",
+    )
+    parser.add_argument("--metric", choices=["seconds", "peak_memory"], nargs="+")
+    args = parser.parse_args()
+
+    metrics = args.metric or ["seconds", "peak_memory"]
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    regressions = 0
+
+    print("corpus,documents,benchmark,metric,baseline,current,ratio")
+    for key in sorted(baseline.keys() & current.keys()):
+        for metric in metrics:
+            before = baseline[key].get(metric)
+            after = current[key].get(metric)
+            if not before or after is None:
+                continue
+
+            ratio = after / before
+            flag = ""
+            if ratio > 1 + args.threshold:
+                regressions += 1
+                flag = ",REGRESSION"
+            print(
+                f"{','.join(map(str, key))},{metric},{before},{after},{ratio:.3f}{flag}"
+            )
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
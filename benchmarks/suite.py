@@ -0,0 +1,203 @@
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import chapter_data, fragment_data
+from ebl_ngrams import ChapterCorpus, FragmentCorpus
+from ebl_ngrams.base_corpus import ENGINES, BaseCorpus
+
+PACKAGES = ("ebl-ngram-matcher", "numpy", "pandas", "scipy")
+CORPUS_ENGINES = ("sets", "sparse")
+
+
+def package_version(name: str) -> Optional[str]:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def environment() -> dict:
+    return {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {name: package_version(name) for name in PACKAGES},
+    }
+
+
+def measure(func: Callable[[], object], repeat: int, memory: bool) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+
+    result = {"seconds": min(seconds), "median_seconds": statistics.median(seconds)}
+    if memory:
+        tracemalloc.start()
+        func()
+        result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def benchmark_corpus(
+    corpus_type: type,
+    data: List[dict],
+    queries: BaseCorpus,
+    args: argparse.Namespace,
+) -> Iterator[dict]:
+    def run(name: str, func: Callable[[], object], repeat=args.repeat, **extra):
+        result = {
+            "corpus": corpus_type.__name__,
+            "documents": len(data),
+            "benchmark": name,
+            **measure(func, repeat, not args.no_memory),
+            **extra,
+        }
+        print(
+            f"{result['corpus']:>16} {result['documents']:>7} "
+            f"{name:<28} {result['seconds']:10.4f} s",
+            file=sys.stderr,
+        )
+        return result
+
+    yield run("build", lambda: corpus_type(data, args.n_values, workers=args.workers))
+    corpus = corpus_type(data, args.n_values, workers=args.workers)
+
+    subset = args.n_values[:-1] or args.n_values
+    yield run("rebuild_ngrams", lambda: corpus.rebuild_ngrams(*subset))
+
+    median_length = np.median(corpus.documents.map(lambda doc: len(doc.ngram_keys)))
+    yield run(
+        "filter", lambda: corpus.filter(lambda doc: len(doc.ngram_keys) > median_length)
+    )
+
+    yield run(
+        "build_indices",
+        lambda: (corpus.matrix, corpus.inverted_index, corpus.idf_table),
+        repeat=1,
+    )
+
+    query = queries.documents.iloc[0]
+    for engine in ENGINES:
+        yield run(
+            f"match_document[{engine}]", lambda: corpus.match(query, engine=engine)
+        )
+    yield run("match_document_top_k", lambda: corpus.match_top_k(query, args.top_k))
+    yield run("match_tf_idf_document", lambda: corpus.match_tf_idf(query))
+    for engine in args.corpus_engines:
+        yield run(
+            f"match_corpus[{engine}]",
+            lambda: corpus.match(queries, engine=engine),
+            queries=len(queries),
+        )
+    yield run(
+        "match_tf_idf_corpus",
+        lambda: corpus.match_tf_idf(queries),
+        queries=len(queries),
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "corpus"
+        yield run("save", lambda: corpus.save(path), repeat=1)
+        size = directory_size(path)
+        yield run("open", lambda: corpus_type.open(path), bytes=size)
+        yield run("open_lazy", lambda: corpus_type.open(path, lazy=True), bytes=size)
+
+    pickled = pickle.dumps(corpus)
+    yield run("pickle_dumps", lambda: pickle.dumps(corpus), bytes=len(pickled))
+    yield run("pickle_loads", lambda: pickle.loads(pickled), bytes=len(pickled))
+
+
+def generate(generator: Callable, size: int, seed: int, args) -> List[dict]:
+    return generator(
+        size,
+        mean_lines=(
+            args.mean_lines if generator is fragment_data else args.chapter_lines
+        ),
+        line_length=args.line_length,
+        unknown_ratio=args.unknown_ratio,
+        seed=seed,
+    )
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, object]:
+    results = []
+    suites = [
+        (FragmentCorpus, fragment_data, args.fragments),
+        (ChapterCorpus, chapter_data, args.chapters),
+    ]
+    queries = FragmentCorpus(
+        generate(fragment_data, args.queries, args.seed + 1, args), args.n_values
+    )
+
+    for corpus_type, generator, sizes in suites:
+        for size in sizes:
+            data = generate(generator, size, args.seed, args)
+            results.extend(benchmark_corpus(corpus_type, data, queries, args))
+
+    return {"environment": environment(), "parameters": vars(args), "results": results}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark corpus construction, matching and serialization "
+        "on synthetic data."
+    )
+    parser.add_argument("--fragments", type=int, nargs="*", default=[1000, 10000])
+    parser.add_argument("--chapters", type=int, nargs="*", default=[100, 1000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-values", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--mean-lines", type=int, default=8)
+    parser.add_argument("--chapter-lines", type=int, default=40)
+    parser.add_argument("--line-length", type=int, default=10)
+    parser.add_argument("--unknown-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--corpus-engines", nargs="+", choices=CORPUS_ENGINES, default=["sparse"]
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Skip the additional run that measures peak memory with tracemalloc.",
+    )
+    parser.add_argument("--output", type=Path, help="Write the results to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = run_suite(args)
+    output = json.dumps(report, indent=2, default=str)
+
+    if args.output is None:
+        print(output)
+    else:
+        args.output.write_text(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from typing import List
+
+import numpy as np
+
+from ebl_ngrams.document_model import UNKNOWN_SIGN
+
+
+def mock_signs(
+    rng: np.random.Generator,
+    n_lines: int,
+    line_length: int,
+    unknown_ratio=0.2,
+    vocabulary_size=600,
+) -> str:
+    signs = np.char.add(
+        "ABZ", rng.integers(1, vocabulary_size, (n_lines, line_length)).astype(str)
+    )
+    signs[rng.random(signs.shape) < unknown_ratio] = UNKNOWN_SIGN
+    return "\n".join(" ".join(line) for line in signs)
+
+
+def fragment_data(
+    size: int,
+    mean_lines=8,
+    line_length=10,
+    unknown_ratio=0.2,
+    seed=0,
+) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "_id": f"Synthetic.{i}",
+            "signs": mock_signs(
+                rng, 1 + rng.poisson(mean_lines), line_length, unknown_ratio
+            ),
+        }
+        for i in range(size)
+    ]
+
+
+def manuscript(rng: np.random.Generator, lines: int) -> dict:
+    return {
+        "provenance": "Nineveh",
+        "period": "Neo-Assyrian",
+        "type": "Library",
+        "siglumDisambiguator": str(rng.integers(1, 1000)),
+        "colophon": {"numberOfLines": int(rng.integers(0, min(3, lines)))},
+        "unplacedLines": {"numberOfLines": 0},
+    }
+
+
+def chapter_data(
+    size: int,
+    manuscripts=8,
+    mean_lines=40,
+    line_length=10,
+    unknown_ratio=0.2,
+    seed=0,
+) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    data = []
+
+    for i in range(size):
+        lines = [1 + rng.poisson(mean_lines) for _ in range(manuscripts)]
+        data.append(
+            {
+                "signs": [
+                    mock_signs(rng, n_lines, line_length, unknown_ratio)
+                    for n_lines in lines
+                ],
+                "manuscripts": [manuscript(rng, n_lines) for n_lines in lines],
+                "textId": {"genre": "L", "category": i // 100, "index": i % 100},
+                "stage": "Standard Babylonian",
+                "name": str(i),
+            }
+        )
+    return data
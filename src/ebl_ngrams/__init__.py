@@ -3,3 +3,5 @@ from ebl_ngrams.fragment_model import FragmentModel
 from ebl_ngrams.fragment_corpus import FragmentCorpus
 from ebl_ngrams.chapter_model import ChapterModel
 from ebl_ngrams.chapter_corpus import ChapterCorpus
+from ebl_ngrams.chapter_model import ManuscriptModel
+from ebl_ngrams.chapter_corpus import ManuscriptCorpus
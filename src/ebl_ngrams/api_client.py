@@ -0,0 +1,195 @@
+import codecs
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ebl_ngrams.http_cache import ResponseCache
+
+API_URL = "https://www.ebl.lmu.de/api/"
+DEFAULT_TIMEOUT = (10, 300)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_WORKERS = 8
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CHUNK_SIZE = 2**16
+CACHE_VARIABLE = "EBL_NGRAMS_CACHE"
+
+WHITESPACE = re.compile(r"\s*")
+DELIMITERS = ",] \t\n\r"
+START, FIRST, ITEM, SEPARATOR, END = range(5)
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer = ""
+    state = START
+
+    for chunk in chunks:
+        buffer += chunk
+        position = WHITESPACE.match(buffer).end()
+
+        while position < len(buffer):
+            char = buffer[position]
+            if state == START:
+                if char != "[":
+                    raise ValueError("Expected a JSON array.")
+                state = FIRST
+                position += 1
+            elif state == END:
+                raise ValueError("Unexpected data after JSON array.")
+            elif char == "]" and state in (FIRST, SEPARATOR):
+                state = END
+                position += 1
+            elif state == SEPARATOR:
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']', got {char!r}.")
+                state = ITEM
+                position += 1
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    break
+                if end == len(buffer) or buffer[end] not in DELIMITERS:
+                    break
+                yield item
+                state = SEPARATOR
+                position = end
+            position = WHITESPACE.match(buffer, position).end()
+
+        buffer = buffer[position:]
+
+    if state != END:
+        raise ValueError("Incomplete JSON array.")
+
+
+def decode_chunks(chunks: Iterable[bytes], encoding="utf-8") -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def call_safely(func: Callable, *args, **kwargs) -> Any:
+    try:
+        return func(*args, **kwargs)
+    except Exception as error:
+        return error
+
+
+def map_concurrently(func: Callable, items: Sequence, workers: int) -> List:
+    if workers <= 1 or len(items) <= 1:
+        return list(map(func, items))
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+class ApiClient:
+    def __init__(
+        self,
+        base_url: str = API_URL,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        workers: int = DEFAULT_WORKERS,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.base_url = base_url
+        self.cache = cache
+        self.timeout = timeout
+        self.workers = workers
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(
+            pool_connections=workers,
+            pool_maxsize=workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=["GET"],
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        return path if "://" in path else f"{self.base_url}{path}"
+
+    def get(
+        self, path: str, stream=False, headers: Optional[Dict[str, str]] = None
+    ) -> requests.Response:
+        response = self.session.get(
+            self.url(path), timeout=self.timeout, stream=stream, headers=headers
+        )
+        response.raise_for_status()
+        return response
+
+    def iter_bytes(self, path: str) -> Iterator[bytes]:
+        url = self.url(path)
+        entry = None if self.cache is None else self.cache.entry(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            yield from self.cache.read(url)
+            return
+
+        headers = None if entry is None else self.cache.conditional_headers(entry)
+        with self.get(url, stream=True, headers=headers) as response:
+            if self.cache is None:
+                yield from response.iter_content(CHUNK_SIZE)
+            elif response.status_code == requests.codes.not_modified:
+                yield from self.cache.revalidate(url, entry)
+            else:
+                yield from self.cache.write(url, response)
+
+    def get_json(self, path: str) -> Any:
+        return json.loads(b"".join(self.iter_bytes(path)))
+
+    def iter_json(self, path: str) -> Iterator[Any]:
+        return iter_json_array(decode_chunks(self.iter_bytes(path)))
+
+    def get_many(
+        self, paths: Sequence[str], workers: Optional[int] = None, return_errors=False
+    ) -> List:
+        get_json = (
+            partial(call_safely, self.get_json) if return_errors else self.get_json
+        )
+        return map_concurrently(get_json, paths, workers or self.workers)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "ApiClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+_default_client: Optional[ApiClient] = None
+
+
+def default_client() -> ApiClient:
+    global _default_client
+    if _default_client is None:
+        cache = os.environ.get(CACHE_VARIABLE)
+        _default_client = ApiClient(cache=cache and ResponseCache(cache))
+    return _default_client
@@ -1,94 +1,259 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from operator import attrgetter
-from functools import singledispatchmethod
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, singledispatchmethod
 import datetime
-from typing import Callable, Optional, Sequence
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Sized,
+    Tuple,
+    Union,
+)
 import pandas as pd
 import numpy as np
+from scipy import sparse
 
-import requests
 from tqdm import tqdm
 
+from ebl_ngrams.api_client import ApiClient, default_client
 from ebl_ngrams.document_model import (
-    API_URL,
     DEFAULT_N_VALUES,
     BaseDocument,
     NGramSet,
+    intersect_keys,
     validate_n_values,
 )
 from ebl_ngrams.metrics import no_weight, weight_by_len
-from copy import deepcopy
+from ebl_ngrams.ngram_keys import (
+    decode_table,
+    export_keys,
+    filter_keys,
+    import_keys,
+    key_lengths,
+    merge_keys,
+    signs_of,
+    unpack,
+)
+from ebl_ngrams import storage
+from ebl_ngrams.instrumentation import stage
+from ebl_ngrams.integer_encoder import IntegerEncoder
+from ebl_ngrams.inverted_index import InvertedIndex
+from ebl_ngrams.lazy_documents import LazyDocuments
+from ebl_ngrams.metadata import any_by_document, match_metadata
+from ebl_ngrams.parallel import match_matrix
+from ebl_ngrams.ngram_matrix import (
+    DEFAULT_MEMORY_BUDGET,
+    NGramMatrix,
+    encode_rows,
+    overlap_coefficient,
+    select_top_k,
+)
+from copy import copy
 
+ENGINES = ("sets", "sparse", "index")
+CHUNKS_PER_WORKER = 16
+DEFAULT_VIEWS = 8
+STREAM_CHUNKSIZE = 64
 
-class IntegerEncoder:
-    def __init__(self, items: Optional[Sequence] = None):
-        self._encode = {}
-        self._decode = {}
 
-        if items:
-            for key, item in enumerate(set(items)):
-                self._encode[item] = key
-                self._decode[key] = item
+def collect(items: Iterable, records: list) -> Iterator:
+    for item in items:
+        records.append(item)
+        yield item
 
-    def add_item(self, item):
-        if item not in self.items:
-            key = max(self._decode) + 1
-            self._encode[item] = key
-            self._decode[key] = item
 
-    @property
-    def items(self):
-        return set(self._encode)
+def validate_engine(engine: str) -> str:
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown engine {engine!r}, must be one of {', '.join(ENGINES)}."
+        )
+    return engine
+
+
+def validate_top_k(top_k: int) -> int:
+    if top_k <= 0:
+        raise ValueError("top_k must be greater than zero.")
+    return top_k
+
+
+def to_series(documents: Sequence[BaseDocument]) -> pd.Series:
+    return pd.Series(list(documents), index=[document.id_ for document in documents])
+
+
+def levels(index: pd.Index) -> List[pd.Index]:
+    return [index.get_level_values(level) for level in range(index.nlevels)]
+
+
+class ViewCache:
+    def __init__(self, size: int = DEFAULT_VIEWS):
+        self.size = size
+        self._views: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
 
-    def update(self, items):
-        for item in set(items) - self.items:
-            self.add_item(item)
+    def __getstate__(self) -> dict:
+        return {"size": self.size}
 
-    def decode(self, key):
-        return self._decode[key]
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["size"])
 
-    def encode(self, item):
-        return self._encode[item]
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._views:
+                self._views.move_to_end(key)
+                return self._views[key]
 
-    def encode_many(self, items):
-        return set(map(self.encode, items))
+        view = factory()
+        with self._lock:
+            view = self._views.setdefault(key, view)
+            self._views.move_to_end(key)
+            if len(self._views) > self.size:
+                self._views.popitem(last=False)
+        return view
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._views
+
+    def __len__(self):
+        return len(self._views)
 
 
 class BaseCorpus(ABC):
     _collection: str
-    documents: pd.Series
+    view_cache_size = DEFAULT_VIEWS
+    documents: Union[pd.Series, LazyDocuments]
 
-    def __init__(self, data, n_values: Sequence[int], show_progress=False, name=""):
+    def __init__(
+        self,
+        data,
+        n_values: Sequence[int],
+        show_progress=False,
+        name="",
+        workers: Optional[int] = None,
+    ):
         self.n_values = validate_n_values(n_values)
         self.retrieved_on = datetime.datetime.now()
         self.name = name
-        self.data = data
+        self.data = data if isinstance(data, Sized) else []
         self._tqdm_config = {
-            "total": len(data) if show_progress else 0,
+            "total": (
+                (len(data) if isinstance(data, Sized) else None) if show_progress else 0
+            ),
             "desc": f"Building {self._collection} model",
             "disable": not show_progress,
         }
-        self._idf_table = None
-        self._ngrams = None
+        self._init_state()
 
-        self.documents = self._load(data)
-        self.encoder = IntegerEncoder(self.get_ngrams())
+        self.documents = self._load(
+            data if isinstance(data, Sized) else collect(data, self.data), workers
+        )
+        self.encoder = IntegerEncoder(self.get_keys())
+
+    @classmethod
+    @abstractmethod
+    def _create_model(cls, entry, n_values, ngram_keys=None): ...
 
+    @classmethod
     @abstractmethod
-    def _create_model(self, entry): ...
+    def _metadata_rows(cls, entry) -> List[dict]: ...
 
     @property
     def ngrams_by_document(self) -> pd.Series:
         return self.documents.map(attrgetter("ngrams"))
 
     def get_ngrams_by_document(self, *n_values) -> pd.Series:
-        n_values = n_values or self.n_values
-        return self.documents.map(
-            lambda document: document.get_ngrams(*(n_values or self.n_values))
+        return self._views.get(
+            ("ngrams_by_document", self._view_key(n_values)),
+            lambda: self._get_ngrams_by_document(*n_values),
         )
 
+    def _get_ngrams_by_document(self, *n_values) -> pd.Series:
+        with stage("ngrams_by_document", documents=len(self.documents)):
+            return self.get_keys_by_document(*n_values).map(unpack)
+
+    def get_keys_by_document(self, *n_values) -> pd.Series:
+        return self._views.get(
+            ("keys_by_document", self._view_key(n_values)),
+            lambda: self._get_keys_by_document(*n_values),
+        )
+
+    def _get_keys_by_document(self, *n_values) -> pd.Series:
+        n_values = n_values or self.n_values
+        with stage("keys_by_document", documents=len(self.documents)) as counts:
+            if isinstance(self.documents, LazyDocuments):
+                rows = self.matrix.row_keys(self.encoder.keys)
+                keys = pd.Series(
+                    [filter_keys(row, n_values) for row in rows],
+                    index=self.documents.index,
+                    dtype=object,
+                )
+            else:
+                keys = self.documents.map(lambda document: document.get_keys(*n_values))
+            if counts is not None:
+                counts["ngrams"] = int(keys.map(len).sum())
+            return keys
+
+    def _view_key(self, n_values: Sequence[int]) -> Tuple[int, ...]:
+        return tuple(sorted(set(n_values or self.n_values)))
+
+    @classmethod
+    def _to_index(cls, ids: list) -> pd.Index:
+        return pd.Index(ids)
+
     def _to_series(self, data: list) -> pd.Series:
-        return pd.Series(data, index=[item.id_ for item in data], name=self._collection)
+        return pd.Series(
+            data,
+            index=self._to_index([item.id_ for item in data]),
+            name=self._collection,
+        )
+
+    @classmethod
+    def _from_documents(
+        cls,
+        documents: list,
+        n_values: Sequence[int],
+        name="",
+        encoder: Optional[IntegerEncoder] = None,
+    ) -> "BaseCorpus":
+        corpus = cls.__new__(cls)
+        corpus.n_values = n_values
+        corpus.retrieved_on = datetime.datetime.now()
+        corpus.name = name
+        corpus.data = None
+        corpus._tqdm_config = {"total": 0, "disable": True}
+        corpus._init_state()
+        corpus.documents = corpus._to_series(documents)
+        corpus.encoder = (
+            IntegerEncoder(corpus.get_keys()) if encoder is None else encoder
+        )
+        return corpus
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if state.get("_ngram_keys") is not None:
+            state["_ngram_keys"] = export_keys(state["_ngram_keys"])
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self._ngram_keys is not None:
+            self._ngram_keys = import_keys(*self._ngram_keys)
+
+    def _init_state(self) -> None:
+        self._parent = None
+        self._rows = None
+        self._version = 0
+        self.frozen = False
+        self._reset_ngrams()
 
     @classmethod
     def load(
@@ -97,25 +262,180 @@ class BaseCorpus(ABC):
         show_progress=True,
         name="",
         transform: Callable[[Sequence[dict]], Sequence[dict]] = None,
+        workers: Optional[int] = None,
+        client: Optional[ApiClient] = None,
     ):
-        response = requests.get(f"{API_URL}{cls._api_url}")
-        response.raise_for_status()
-
-        return cls(
-            response.json() if transform is None else transform(response.json()),
-            n_values,
-            show_progress,
-            name,
+        client = client or default_client()
+
+        with stage("load", collection=cls._collection):
+            return cls(
+                (
+                    client.iter_json(cls._api_url)
+                    if transform is None
+                    else transform(client.get_json(cls._api_url))
+                ),
+                n_values,
+                show_progress,
+                name,
+                workers,
+            )
+
+    def _load(self, data: Iterable[dict], workers: Optional[int] = None) -> pd.Series:
+        with stage("build", workers=workers or 1) as counts:
+            documents = self._build_documents(data, workers)
+            if counts is not None:
+                counts["documents"] = len(documents)
+            return documents
+
+    def _build_documents(
+        self, data: Iterable[dict], workers: Optional[int] = None
+    ) -> pd.Series:
+        if workers is None or workers <= 1:
+            return self._to_series(
+                [
+                    self._create_model(entry, self.n_values)
+                    for entry in tqdm(data, **self._tqdm_config)
+                ]
+            )
+
+        chunksize = (
+            max(1, len(data) // (workers * CHUNKS_PER_WORKER))
+            if isinstance(data, Sized)
+            else STREAM_CHUNKSIZE
         )
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return self._to_series(
+                list(
+                    tqdm(
+                        executor.map(
+                            partial(type(self)._create_model, n_values=self.n_values),
+                            data,
+                            chunksize=chunksize,
+                        ),
+                        **self._tqdm_config,
+                    )
+                )
+            )
 
-    def _load(self, data: dict) -> pd.Series:
-        return self._to_series(
-            [
-                self._create_model(entry, self.n_values)
-                for entry in tqdm(data, **self._tqdm_config)
-            ]
+    def save(self, path: storage.PathLike) -> None:
+        signs, table = export_keys(self.encoder.keys)
+        index = self.inverted_index
+        storage.save(
+            path,
+            {
+                "class": type(self).__name__,
+                "collection": self._collection,
+                "name": self.name,
+                "n_values": list(self.n_values),
+                "retrieved_on": self.retrieved_on.isoformat(),
+                "shape": list(self.matrix.shape),
+            },
+            {
+                "vocabulary": table,
+                "indices": self.matrix.matrix.indices,
+                "indptr": self.matrix.matrix.indptr,
+                "postings": index.postings,
+                "postings_indptr": index.indptr,
+            },
+            {
+                "signs": signs,
+                "ids": self.documents.index.to_list(),
+            },
+            self._record_files(),
         )
 
+    def _records(self) -> Sequence[dict]:
+        if isinstance(self.documents, LazyDocuments):
+            return self.documents.records
+        return [document.to_record() for document in self.documents]
+
+    def _record_files(self) -> Dict[str, Iterable[dict]]:
+        return {storage.RECORDS: self._records()}
+
+    @classmethod
+    def _load_records(cls, path: storage.PathLike) -> Sequence[dict]:
+        return storage.load_records(path)
+
+    @classmethod
+    def _record_factory(cls, n_values) -> Callable[[dict], BaseDocument]:
+        return partial(cls._create_model, n_values=n_values)
+
+    @classmethod
+    def _open_documents(
+        cls, records: Sequence[dict], keys: Sequence[np.ndarray], n_values
+    ) -> List[BaseDocument]:
+        return [
+            cls._create_model(entry, n_values, ngram_keys)
+            for entry, ngram_keys in zip(records, keys)
+        ]
+
+    @classmethod
+    def open(cls, path: storage.PathLike, mmap=True, lazy=False) -> "BaseCorpus":
+        metadata = storage.load_metadata(path)
+        cls = cls._get_subclass(metadata["class"])
+
+        corpus = cls.__new__(cls)
+        corpus.n_values = tuple(metadata["n_values"])
+        corpus.retrieved_on = datetime.datetime.fromisoformat(metadata["retrieved_on"])
+        corpus.name = metadata["name"]
+        corpus.data = cls._load_records(path)
+        corpus._tqdm_config = {"total": 0, "disable": True}
+        corpus._init_state()
+
+        signs = storage.load_table(path, "signs")
+        keys = decode_table(signs, storage.load_array(path, "vocabulary", mmap))
+        lengths = key_lengths(keys)
+        indices = storage.load_array(path, "indices", mmap)
+        corpus._matrix = NGramMatrix(
+            sparse.csr_matrix(
+                (
+                    np.ones(len(indices), dtype=np.float32),
+                    indices,
+                    storage.load_array(path, "indptr", mmap),
+                ),
+                shape=tuple(metadata["shape"]),
+                copy=False,
+            ),
+            lengths,
+        )
+
+        index = cls._to_index(storage.load_table(path, "ids"))
+        if lazy:
+            corpus.documents = LazyDocuments(
+                index,
+                corpus.data,
+                cls._record_factory(corpus.n_values),
+                cls._collection,
+            )
+        else:
+            with stage("build", documents=len(index)):
+                corpus.documents = corpus._to_series(
+                    cls._open_documents(
+                        corpus.data, corpus._matrix.row_keys(keys), corpus.n_values
+                    )
+                )
+            corpus.documents.index = index
+        corpus.encoder = IntegerEncoder.from_vocabulary(keys)
+        corpus._inverted_index = InvertedIndex(
+            storage.load_array(path, "postings_indptr", mmap),
+            storage.load_array(path, "postings", mmap),
+            lengths,
+            len(corpus.documents),
+        )
+        corpus._ngram_keys = np.sort(keys[corpus.matrix.document_frequencies > 0])
+        return corpus
+
+    @classmethod
+    def _get_subclass(cls, name: str) -> type:
+        if cls.__name__ == name:
+            return cls
+        for subclass in cls.__subclasses__():
+            try:
+                return subclass._get_subclass(name)
+            except ValueError:
+                continue
+        raise ValueError(f"{name} is not a subclass of {cls.__name__}.")
+
     def __len__(self):
         return len(self.documents)
 
@@ -131,27 +451,189 @@ class BaseCorpus(ABC):
     def __repr__(self):
         return str(self)
 
+    @property
+    def ngram_keys(self) -> np.ndarray:
+        if self._ngram_keys is None:
+            if isinstance(self.documents, LazyDocuments):
+                keys = [self.encoder.keys[self.matrix.document_frequencies > 0]]
+            else:
+                keys = [document.ngram_keys for document in self.documents]
+            self._ngram_keys = merge_keys(keys)
+        return self._ngram_keys
+
+    @property
+    def _vocab(self) -> set:
+        return signs_of(self.ngram_keys)
+
     @property
     def ngrams(self) -> set:
         if self._ngrams is None:
-            self._ngrams = {
-                ngram for document in self.documents for ngram in document.get_ngrams()
-            }
+            self._ngrams = unpack(self.ngram_keys)
         return self._ngrams
 
-    def get_ngrams(self, *n_values) -> NGramSet:
+    @property
+    def matrix(self) -> NGramMatrix:
+        if self._matrix is None:
+            with stage("build_matrix", documents=len(self.documents)):
+                self._matrix = (
+                    NGramMatrix.from_keys(
+                        self.documents.map(attrgetter("ngram_keys")), self.encoder
+                    )
+                    if self._parent is None
+                    else self._reference.matrix.select(self._rows)
+                )
+        return self._matrix
+
+    @property
+    def inverted_index(self) -> InvertedIndex:
+        if self._inverted_index is None:
+            matrix = self.matrix
+            with stage("build_inverted_index", nonzeros=matrix.matrix.nnz):
+                self._inverted_index = InvertedIndex.from_matrix(matrix)
+        return self._inverted_index
+
+    def get_keys(self, *n_values) -> np.ndarray:
         n_values = n_values or self.n_values
-        return (
-            {ngram for ngram in self.ngrams if len(ngram) in n_values}
-            if n_values
-            else self.ngrams
+        return filter_keys(self.ngram_keys, n_values)
+
+    def get_ngrams(self, *n_values) -> NGramSet:
+        return self._views.get(
+            ("ngrams", self._view_key(n_values)),
+            lambda: unpack(self.get_keys(*n_values)),
         )
 
+    def add_documents(
+        self, data: Sequence[dict], workers: Optional[int] = None
+    ) -> "BaseCorpus":
+        self._check_writable()
+        documents = self._load(data, workers)
+        duplicates = documents.index[
+            documents.index.isin(self.documents.index) | documents.index.duplicated()
+        ]
+        if len(duplicates):
+            raise ValueError(
+                f"Documents already in corpus: {', '.join(map(str, duplicates))}"
+            )
+        self._append(documents)
+        return self
+
+    def remove_documents(self, ids: Sequence[str]) -> "BaseCorpus":
+        self._check_writable()
+        ids = pd.Index(ids)
+        missing = ids[~ids.isin(self.documents.index)]
+        if len(missing):
+            raise ValueError(f"Documents not in corpus: {', '.join(map(str, missing))}")
+        self._remove(self.documents.index.isin(ids))
+        return self
+
+    def update_documents(
+        self, data: Sequence[dict], workers: Optional[int] = None
+    ) -> "BaseCorpus":
+        self._check_writable()
+        documents = self._load(data, workers)
+        self._remove(self.documents.index.isin(documents.index))
+        self._append(documents)
+        return self
+
+    def _append(self, documents: pd.Series) -> None:
+        self._check_mutable()
+        keys_by_document = documents.map(attrgetter("ngram_keys"))
+        keys = merge_keys(keys_by_document.to_list())
+        n_columns = len(self.encoder)
+        self.encoder.update(keys)
+
+        if self._matrix is not None:
+            self._matrix = self._matrix.extend(
+                encode_rows(keys_by_document, self.encoder),
+                key_lengths(self.encoder.keys[n_columns:]),
+            )
+        if self._ngram_keys is not None:
+            self._ngram_keys = merge_keys([self._ngram_keys, keys])
+
+        if isinstance(self.documents, LazyDocuments):
+            self.documents = self.documents.append(documents)
+        else:
+            self.documents = pd.concat([self.documents, documents])
+        self._reset_statistics()
+
+    def _remove(self, removed: np.ndarray) -> None:
+        self._check_mutable()
+        if self._matrix is not None:
+            frequencies = self._matrix.document_frequencies
+            self._matrix = self._matrix.select(np.flatnonzero(~removed))
+            dropped = (frequencies > 0) & (self._matrix.document_frequencies == 0)
+            if self._ngram_keys is not None:
+                self._ngram_keys = np.setdiff1d(
+                    self._ngram_keys,
+                    self.encoder.decode_array(np.flatnonzero(dropped)),
+                    assume_unique=True,
+                )
+        else:
+            self._ngram_keys = None
+
+        self.documents = self.documents[~removed]
+        self._reset_statistics()
+
+    def freeze(self) -> "BaseCorpus":
+        self._prewarm()
+        if self._parent is None:
+            self.encoder.freeze()
+        self.frozen = True
+        return self
+
+    def _prewarm(self) -> None:
+        self.get_keys_by_document()
+        self.matrix.document_frequencies
+        for length_weighting in (False, True):
+            self.inverted_index.min_sizes(self.n_values, length_weighting)
+        self.idf_table
+
+    def _check_writable(self) -> None:
+        if self.frozen:
+            raise ValueError("Cannot change a frozen corpus.")
+        if self._parent is not None:
+            raise ValueError(
+                "Cannot change a view, change the corpus it was selected from instead."
+            )
+
+    def _check_mutable(self) -> None:
+        self._check_writable()
+        self._version += 1
+
+    @property
+    def _reference(self) -> "BaseCorpus":
+        if self._parent is None:
+            return self
+        if self._parent._version != self._version:
+            raise ValueError("The corpus this view was selected from has changed.")
+        return self._parent
+
+    def select(self, rows) -> "BaseCorpus":
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            if len(rows) != len(self):
+                raise ValueError("The mask must have one value per document.")
+            rows = np.flatnonzero(rows)
+        rows = np.arange(len(self))[rows.astype(np.int64)]
+
+        view = copy(self)
+        view._reset_ngrams()
+        view._parent = self._reference
+        view._rows = rows if self._parent is None else self._rows[rows]
+        view._version = view._parent._version
+        view.documents = self.documents.iloc[rows]
+
+        return view
+
     def rebuild_ngrams(self, *n_values) -> "BaseCorpus":
         validate_n_values(n_values)
-        corpus = deepcopy(self)
-        corpus._reset_ngrams()
-        corpus.documents = corpus.documents.map(lambda doc: doc.set_ngrams(*n_values))
+        corpus = copy(self)
+        corpus._init_state()
+        corpus.n_values = n_values
+        corpus.documents = corpus.documents.map(
+            lambda doc: copy(doc).set_ngrams(*n_values)
+        )
+        corpus.encoder = IntegerEncoder(corpus.get_keys())
 
         return corpus
 
@@ -163,13 +645,14 @@ class BaseCorpus(ABC):
 
     @intersection.register(BaseDocument)
     def _(self, other: BaseDocument, *n_values) -> pd.Series:
+        with stage("intersection", documents=len(self.documents)):
+            return self._intersect_keys(other, *n_values).map(unpack).rename(other.id_)
+
+    def _intersect_keys(self, other: BaseDocument, *n_values) -> pd.Series:
         n_values = n_values or self.n_values
-        return pd.Series(
-            np.vectorize(set.intersection)(
-                other.get_ngrams(*n_values), self.get_ngrams_by_document(*n_values)
-            ),
-            index=self.documents.index,
-            name=other.id_,
+        query = other.get_keys(*n_values)
+        return self.get_keys_by_document(*n_values).map(
+            lambda keys: intersect_keys(keys, query)
         )
 
     @singledispatchmethod
@@ -185,34 +668,284 @@ class BaseCorpus(ABC):
         *n_values,
         length_weighting=False,
         include_overlaps=False,
+        engine="sets",
+        top_k: Optional[int] = None,
+    ) -> pd.Series:
+        with stage("match", engine=engine, documents=len(self.documents)):
+            n_values = n_values or self.n_values
+            weighted_sum = weight_by_len if length_weighting else no_weight
+            other_size = weighted_sum(other.get_keys(*n_values))
+            intersection = (
+                self.intersection(other, *n_values) if include_overlaps else None
+            )
+
+            if validate_engine(engine) == "index" and top_k is not None:
+                result = self._match_top_k(
+                    other, validate_top_k(top_k), n_values, length_weighting, other_size
+                )
+            else:
+                result = self._match_all(
+                    other, engine, n_values, length_weighting, other_size, intersection
+                )
+                if top_k is not None:
+                    result = result.iloc[
+                        select_top_k(result.to_numpy(), validate_top_k(top_k))
+                    ]
+
+            if include_overlaps:
+                return (
+                    result.to_frame("score")
+                    .join(
+                        intersection.str.len()
+                        .to_frame("overlap_size")
+                        .assign(overlap=intersection)
+                    )
+                    .sort_values(["score", "overlap_size"], ascending=False)
+                )
+
+            return result.sort_values(ascending=False)
+
+    def _match_all(
+        self,
+        other: BaseDocument,
+        engine,
+        n_values,
+        length_weighting,
+        other_size,
+        intersection: Optional[pd.Series] = None,
     ) -> pd.Series:
-        n_values = n_values or self.n_values
-        intersection = self.intersection(other, *n_values)
         weighted_sum = weight_by_len if length_weighting else no_weight
 
-        intersection_sizes = weighted_sum(intersection)
-        self_sizes = weighted_sum(self.get_ngrams_by_document(*n_values))
-        other_size = weighted_sum(other.get_ngrams(*n_values))
+        if engine == "index":
+            weights = self.matrix.column_weights(n_values, length_weighting)
+            query = self._encode_query(other, n_values)
+            with stage("intersect") as counts:
+                positions, sizes = self.inverted_index.intersection_sizes(
+                    query, weights
+                )
+                if counts is not None:
+                    counts["postings"] = int(
+                        self.inverted_index.posting_lengths(
+                            query[weights[query] > 0]
+                        ).sum()
+                    )
+            index = self.documents.index[positions]
+            intersection_sizes = pd.Series(sizes, index=index)
+            self_sizes = pd.Series(
+                self.inverted_index.sizes(n_values, length_weighting)[positions],
+                index=index,
+            )
+        elif engine == "sparse":
+            weights = self.matrix.column_weights(n_values, length_weighting)
+            query = self._encode_query(other, n_values)
+            with stage("intersect", nonzeros=self.matrix.matrix.nnz):
+                intersection_sizes = pd.Series(
+                    self.matrix.intersection_sizes(query, weights),
+                    index=self.documents.index,
+                )
+            self_sizes = pd.Series(
+                self.matrix.sizes(weights), index=self.documents.index
+            )
+        else:
+            with stage("intersect"):
+                intersection_sizes = weighted_sum(
+                    self._intersect_keys(other, *n_values)
+                    if intersection is None
+                    else intersection
+                )
+            self_sizes = weighted_sum(self.get_keys_by_document(*n_values))
 
         result = intersection_sizes / np.minimum(self_sizes, other_size)
-        result = result.rename(other.id_).fillna(0.0)
-
-        if include_overlaps:
-            return (
-                result.to_frame("score")
-                .join(
-                    intersection.str.len()
-                    .to_frame("overlap_size")
-                    .assign(overlap=intersection)
+        return result.rename(other.id_).fillna(0.0)
+
+    def _encode_query(self, other: BaseDocument, n_values) -> np.ndarray:
+        with stage("encode") as counts:
+            query = self.matrix.encode_query(other.get_keys(*n_values), self.encoder)
+            if counts is not None:
+                counts["ngrams"] = len(query)
+            return query
+
+    def _match_top_k(
+        self, other: BaseDocument, k: int, n_values, length_weighting, other_size
+    ) -> pd.Series:
+        weights = self.matrix.column_weights(n_values, length_weighting)
+        query = self._encode_query(other, n_values)
+        query = query[weights[query] > 0]
+        sizes = self.inverted_index.sizes(n_values, length_weighting)
+        min_sizes = self.inverted_index.min_sizes(n_values, length_weighting)
+
+        def score(documents):
+            return overlap_coefficient(
+                self.matrix.row_intersection_sizes(documents, query, weights),
+                sizes[documents],
+                other_size,
+            )
+
+        with stage("top_k", k=k):
+            positions, scores = self.inverted_index.top_k(
+                query,
+                weights[query] / np.minimum(min_sizes[query], other_size),
+                score,
+                k,
+            )
+        return pd.Series(scores, index=self.documents.index[positions], name=other.id_)
+
+    def match_top_k(self, other, k: int, *n_values, **kwargs):
+        engine = "index" if isinstance(other, BaseDocument) else "sparse"
+        return self.match(other, *n_values, engine=engine, top_k=k, **kwargs)
+
+    def _intersect_documents(self, documents: pd.Series, *n_values) -> pd.DataFrame:
+        return self._intersect_document_keys(documents, *n_values).map(unpack)
+
+    def _intersect_document_keys(self, documents: pd.Series, *n_values) -> pd.DataFrame:
+        other_keys = documents.map(lambda doc: doc.get_keys(*n_values)).to_list()
+        self_keys = self.get_keys_by_document(*n_values).to_list()
+        intersections = np.empty((len(self_keys), len(other_keys)), dtype=object)
+        for row, keys in enumerate(self_keys):
+            for column, other in enumerate(other_keys):
+                intersections[row, column] = intersect_keys(keys, other)
+
+        return pd.DataFrame(
+            intersections, index=self.documents.index, columns=documents.index
+        )
+
+    def _match_documents(
+        self,
+        documents: pd.Series,
+        *n_values,
+        length_weighting=False,
+        engine: Optional[str] = None,
+        memory_budget=DEFAULT_MEMORY_BUDGET,
+        top_k: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        if engine is None:
+            engine = "sets" if top_k is None and workers is None else "sparse"
+        if validate_engine(engine) == "index":
+            raise ValueError(
+                "engine='index' only matches single documents, "
+                "use engine='sparse' for collections."
+            )
+        with stage(
+            "match",
+            engine=engine,
+            documents=len(self.documents),
+            queries=len(documents),
+        ):
+            n_values = n_values or self.n_values
+            weighted_sum = weight_by_len if length_weighting else no_weight
+            keys_by_document = documents.map(lambda doc: doc.get_keys(*n_values))
+
+            if engine == "sparse":
+                weights = self.matrix.column_weights(n_values, length_weighting)
+                queries = self._encode_queries(keys_by_document)
+                with stage("intersect", nonzeros=self.matrix.matrix.nnz):
+                    result = match_matrix(
+                        self.matrix,
+                        queries,
+                        weights,
+                        weighted_sum(keys_by_document).to_numpy(),
+                        self.matrix.sizes(weights),
+                        memory_budget,
+                        top_k if top_k is None else validate_top_k(top_k),
+                        workers,
+                    )
+                return self._to_match_result(result, documents.index)
+
+            if top_k is not None or workers is not None:
+                raise ValueError("top_k and workers require engine='sparse'.")
+
+            with stage("intersect"):
+                intersection_sizes = weighted_sum(
+                    self._intersect_document_keys(documents, *n_values)
                 )
-                .sort_values(["score", "overlap_size"], ascending=False)
+            self_sizes = weighted_sum(self.get_keys_by_document(*n_values))
+            other_sizes = weighted_sum(keys_by_document)
+
+            return intersection_sizes / np.minimum(
+                self_sizes.values[:, None],
+                other_sizes,
             )
 
-        return result.sort_values(ascending=False)
+    def _match_tf_idf_documents(
+        self,
+        documents: pd.Series,
+        *n_values,
+        length_weighting=False,
+        normalize=False,
+        memory_budget=DEFAULT_MEMORY_BUDGET,
+        top_k: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> pd.DataFrame:
+        with stage(
+            "match_tf_idf", documents=len(self.documents), queries=len(documents)
+        ):
+            n_values = n_values or self.n_values
+            documents = documents[documents.map(lambda doc: len(doc.ngram_keys) > 0)]
+            keys_by_document = documents.map(lambda doc: doc.get_keys(*n_values))
+
+            queries = self._encode_queries(keys_by_document)
+            weights = self.matrix.column_weights(n_values, length_weighting)
+            tf_idf_weights = weights * self.idf_table
+
+            if normalize:
+                weighted_sum = weight_by_len if length_weighting else no_weight
+                known_sizes = queries @ weights
+                sizes = (queries @ tf_idf_weights) + self._default_idf * (
+                    weighted_sum(keys_by_document).to_numpy() - known_sizes
+                )
+            else:
+                sizes = np.ones(len(documents))
+
+            with stage("intersect", nonzeros=self.matrix.matrix.nnz):
+                result = match_matrix(
+                    self.matrix,
+                    queries,
+                    tf_idf_weights,
+                    sizes,
+                    None,
+                    memory_budget,
+                    top_k if top_k is None else validate_top_k(top_k),
+                    workers,
+                )
+            if top_k is None:
+                return pd.DataFrame(
+                    result.T, index=documents.index, columns=self.documents.index
+                )
+            return self._to_match_result(result, documents.index)
+
+    def _encode_queries(self, keys_by_document: pd.Series) -> sparse.csr_matrix:
+        with stage("encode") as counts:
+            queries = self.matrix.encode_queries(keys_by_document, self.encoder)
+            if counts is not None:
+                counts["ngrams"] = queries.nnz
+            return queries
+
+    def _to_match_result(self, result, other_index: pd.Index):
+        if isinstance(result, np.ndarray):
+            return pd.DataFrame(result, index=self.documents.index, columns=other_index)
+
+        rows, columns, scores = result
+        return pd.Series(
+            scores,
+            index=pd.MultiIndex.from_arrays(
+                [*levels(other_index[columns]), *levels(self.documents.index[rows])]
+            ),
+            name="score",
+        )
 
     def _reset_ngrams(self):
+        self._ngram_keys = None
+        self._matrix = None
+        self._reset_statistics()
+
+    def _reset_statistics(self):
+        self._views = ViewCache(self.view_cache_size)
         self._ngrams = None
         self._idf_table = None
+        self._inverted_index = None
+        self._metadata = None
+        self._metadata_positions = None
 
     @singledispatchmethod
     def match_tf_idf(self, other, *args, **kwargs):
@@ -222,92 +955,155 @@ class BaseCorpus(ABC):
 
     @match_tf_idf.register
     def _(
-        self, other: BaseDocument, *n_values, length_weighting=False, normalize=False
+        self,
+        other: BaseDocument,
+        *n_values,
+        length_weighting=False,
+        normalize=False,
+        top_k: Optional[int] = None,
     ) -> pd.Series:
-        this_ngrams_arr = (
-            self.get_ngrams_by_document(*n_values).map(self.encoder.encode_many).values
-        )
+        with stage("match_tf_idf", documents=len(self.documents)):
+            n_values = n_values or self.n_values
+            other_keys = other.get_keys(*n_values)
+            query = self._encode_query(other, n_values)
+            weights = self.matrix.column_weights(n_values, length_weighting)
+            weights *= self.idf_table
 
-        other_ngrams = other.get_ngrams(*n_values)
-        self.encoder.update(other_ngrams)
-        other_ngrams_arr = np.array(list(self.encoder.encode_many(other_ngrams)))
+            if top_k is None:
+                with stage("intersect", nonzeros=self.matrix.matrix.nnz):
+                    result = pd.Series(
+                        self.matrix.intersection_sizes(query, weights),
+                        index=self.documents.index,
+                        name=other.id_,
+                    ).sort_values(ascending=False)
+            else:
+                query = query[weights[query] > 0]
 
-        cooccurrence_matrix = np.vectorize(lambda ngram, ngrams: ngram in ngrams)(
-            other_ngrams_arr, this_ngrams_arr[:, None]
-        )
+                def score(documents):
+                    return self.matrix.row_intersection_sizes(documents, query, weights)
+
+                with stage("top_k", k=top_k):
+                    positions, scores = self.inverted_index.top_k(
+                        query, weights[query], score, validate_top_k(top_k)
+                    )
+                result = pd.Series(
+                    scores, index=self.documents.index[positions], name=other.id_
+                )
+
+            if normalize:
+                result /= self._tf_idf_size(other_keys, length_weighting)
+
+            return result
 
-        N = len(self.documents) + 1
-        idf = dict(
-            zip(
-                other_ngrams_arr,
-                np.log(N / (cooccurrence_matrix.sum(axis=0) + 1)) + 1,
+    @property
+    def idf_table(self) -> np.ndarray:
+        if self._parent is not None:
+            return self._reference.idf_table
+        if self._idf_table is None:
+            self._idf_table = (
+                np.log(
+                    (len(self.documents) + 1) / (self.matrix.document_frequencies + 1)
+                )
+                + 1
             )
-        )
+        return self._idf_table
 
-        def weight_tf_idf(ngram):
-            return idf[ngram]
+    @property
+    def _default_idf(self) -> float:
+        return np.log(len(self._reference) + 1) + 1
 
-        def weight_length(ngram):
-            return weight_tf_idf(ngram) * len(ngram) ** 2
+    def _tf_idf_size(self, keys: np.ndarray, length_weighting=False) -> float:
+        weighted_sum = weight_by_len if length_weighting else no_weight
+        query = self.matrix.encode_query(keys, self.encoder)
+        weights = self.matrix.column_weights(
+            np.unique(self.matrix.lengths[query]), length_weighting
+        )[query]
+        return float(
+            weights @ self.idf_table[query]
+            + self._default_idf * (weighted_sum(keys) - weights.sum())
+        )
 
-        weight = weight_length if length_weighting else weight_tf_idf
+    @property
+    def metadata(self) -> pd.DataFrame:
+        if self._metadata is None:
+            if self._parent is None:
+                self._build_metadata()
+            else:
+                self._select_metadata()
+        return self._metadata
 
-        result = (
-            self.intersection(other, *n_values)
-            .map(self.encoder.encode_many)
-            .map(lambda ngrams: sum(weight(ngram) for ngram in ngrams))
-            .sort_values(ascending=False)
+    def _build_metadata(self) -> None:
+        rows = [
+            (position, row)
+            for position, entry in enumerate(self._records())
+            for row in self._metadata_rows(entry)
+        ]
+        self._metadata_positions = np.array(
+            [position for position, _ in rows], dtype=np.int64
+        )
+        index = self.documents.index[self._metadata_positions]
+        self._metadata = pd.DataFrame(
+            [row for _, row in rows],
+            index=index.rename("id") if index.nlevels == 1 else index,
         )
 
-        if normalize:
-            result /= sum(weight(ngram) for ngram in other_ngrams_arr)
+    def _select_metadata(self) -> None:
+        reference = self._reference
+        metadata = reference.metadata
+        view_positions = np.full(len(reference), -1, dtype=np.int64)
+        view_positions[self._rows] = np.arange(len(self))
+        positions = view_positions[reference._metadata_positions]
+        rows = np.flatnonzero(positions >= 0)
+        rows = rows[np.argsort(positions[rows], kind="stable")]
 
-        return result
+        self._metadata = metadata.iloc[rows]
+        self._metadata_positions = positions[rows]
 
-    def filter(self, condition: Callable[[BaseDocument], bool]) -> "BaseCorpus":
-        corpus = deepcopy(self)
-        corpus._reset_ngrams()
-        corpus.documents = corpus.documents.loc[corpus.documents.map(condition)]
+    def where(self, **criteria: Any) -> "BaseCorpus":
+        metadata = self.metadata
+        unknown = set(criteria) - set(metadata.columns)
+        if unknown:
+            raise ValueError(f"Unknown metadata columns: {', '.join(sorted(unknown))}.")
 
-        return corpus
+        rows = np.ones(len(metadata), dtype=bool)
+        for column, value in criteria.items():
+            rows &= match_metadata(metadata[column], value)
+        return self._select_metadata_rows(rows)
+
+    def query(self, expression: str) -> "BaseCorpus":
+        return self._select_metadata_rows(
+            self.metadata.eval(expression).to_numpy(dtype=bool)
+        )
+
+    def _select_metadata_rows(self, rows: np.ndarray) -> "BaseCorpus":
+        return self.select(any_by_document(rows, self._metadata_positions, len(self)))
+
+    def filter(self, condition: Callable[[BaseDocument], bool]) -> "BaseCorpus":
+        return self.select(self.documents.map(condition).to_numpy(dtype=bool))
 
 
 @BaseCorpus.intersection.register
 def _(self: BaseCorpus, other: BaseCorpus, *n_values):
-    return pd.DataFrame(
-        np.vectorize(set.intersection)(
-            self.get_ngrams_by_document(*n_values).values[:, None],
-            other.ngrams_by_document,
-        ),
-        index=self.documents.index,
-        columns=other.documents.index,
-    )
+    return self._intersect_documents(other.documents, *n_values)
 
 
 @BaseCorpus.match.register
-def _(
-    self: BaseCorpus, other: BaseCorpus, *n_values, length_weighting=False
-) -> pd.DataFrame:
-    n_values = n_values or self.n_values
-    weighted_sum = weight_by_len if length_weighting else no_weight
+def _(self: BaseCorpus, other: BaseCorpus, *n_values, **kwargs) -> pd.DataFrame:
+    return self._match_documents(other.documents, *n_values, **kwargs)
 
-    intersection_sizes = weighted_sum(self.intersection(other, *n_values))
-    self_sizes = weighted_sum(self.get_ngrams_by_document(*n_values))
-    other_sizes = weighted_sum(other.get_ngrams_by_document(*n_values))
 
-    return intersection_sizes / np.minimum(
-        self_sizes.values[:, None],
-        other_sizes,
-    )
+@BaseCorpus.match.register(list)
+@BaseCorpus.match.register(tuple)
+def _(self: BaseCorpus, other: Sequence[BaseDocument], *n_values, **kwargs):
+    return self._match_documents(to_series(other), *n_values, **kwargs)
 
 
 @BaseCorpus.match_tf_idf.register
-def _(
-    self, other: BaseCorpus, *n_values, length_weighting=False, normalize=False
-) -> pd.DataFrame:
-    tqdm.pandas()
-    return other.documents[other.get_ngrams_by_document().astype(bool)].progress_apply(
-        lambda doc: self.match_tf_idf(
-            doc, *n_values, length_weighting=length_weighting, normalize=normalize
-        )
-    )
+def _(self, other: BaseCorpus, *n_values, **kwargs) -> pd.DataFrame:
+    return self._match_tf_idf_documents(other.documents, *n_values, **kwargs)
+
+
+@BaseCorpus.match_tf_idf.register(list)
+@BaseCorpus.match_tf_idf.register(tuple)
+def _(self, other: Sequence[BaseDocument], *n_values, **kwargs) -> pd.DataFrame:
+    return self._match_tf_idf_documents(to_series(other), *n_values, **kwargs)
@@ -1,9 +1,78 @@
-from typing import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from ebl_ngrams import storage
 from ebl_ngrams.base_corpus import BaseCorpus
-from ebl_ngrams.chapter_model import ChapterModel, ChapterRecord
+import numpy as np
+import pandas as pd
+
+from ebl_ngrams.chapter_model import (
+    ChapterModel,
+    ChapterRecord,
+    ManuscriptModel,
+    join_by_siglum,
+    to_siglum,
+)
 from ebl_ngrams.document_model import DEFAULT_N_VALUES
 
+CHAPTERS = "chapters"
+
+
+def chapter_key(entry: dict) -> tuple:
+    return (
+        entry["textId"]["genre"],
+        int(entry["textId"]["category"]),
+        int(entry["textId"]["index"]),
+        entry["stage"],
+        entry["name"].strip(),
+    )
+
+
+def resolve_manuscript(chapter: dict, reference: dict) -> dict:
+    return {**chapter, "siglum": reference["siglum"]}
+
+
+class ManuscriptRecords(Sequence):
+    def __init__(self, references: Sequence[dict], chapters: Sequence[dict]):
+        self.references = references
+        self.chapters = chapters
+
+    def __len__(self):
+        return len(self.references)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            reference = self.references[key]
+            return resolve_manuscript(self.chapters[reference["chapter"]], reference)
+        return ManuscriptRecords(self.references[key], self.chapters)
+
+    def __iter__(self) -> Iterator[dict]:
+        position, chapter = None, None
+        for reference in self.references:
+            if reference["chapter"] != position:
+                position = reference["chapter"]
+                chapter = self.chapters[position]
+            yield resolve_manuscript(chapter, reference)
+
+
+class ManuscriptFactory:
+    def __init__(self, n_values):
+        self.n_values = n_values
+        self._chapter: Optional[Tuple[tuple, ChapterModel]] = None
+
+    def __getstate__(self) -> dict:
+        return {"n_values": self.n_values}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def __call__(self, entry: dict) -> ManuscriptModel:
+        key = chapter_key(entry)
+        cached = self._chapter
+        if cached is None or cached[0] != key:
+            cached = (key, ChapterModel(entry, n_values=self.n_values))
+            self._chapter = cached
+        return ManuscriptModel(cached[1], entry["siglum"])
+
 
 class ChapterCorpus(BaseCorpus):
     _collection = "chapters"
@@ -15,18 +84,155 @@ class ChapterCorpus(BaseCorpus):
         n_values=DEFAULT_N_VALUES,
         show_progress=False,
         name="",
+        workers: Optional[int] = None,
     ):
-        super().__init__(data, n_values, show_progress, name)
-        self._vocab = {
-            sign
-            for document in self.documents
-            for ngram in document.ngrams
-            for sign in ngram
-        }
+        super().__init__(data, n_values, show_progress, name, workers)
 
     @property
     def chapters(self):
         return self.documents
 
-    def _create_model(self, entry, n_values):
-        return ChapterModel(entry, n_values=n_values)
+    @property
+    def manuscripts(self) -> "ManuscriptCorpus":
+        if self._manuscripts is None:
+            self._manuscripts = ManuscriptCorpus.from_chapters(self)
+        return self._manuscripts
+
+    def match_manuscripts(self, other, *n_values, **kwargs):
+        return self.manuscripts.match(other, *n_values, **kwargs)
+
+    def freeze(self) -> "ChapterCorpus":
+        self.manuscripts._prewarm()
+        self.manuscripts.frozen = True
+        return super().freeze()
+
+    def _reset_statistics(self):
+        super()._reset_statistics()
+        self._manuscripts = None
+
+    @classmethod
+    def _create_model(cls, entry, n_values, ngram_keys=None):
+        return ChapterModel(entry, n_values, ngram_keys)
+
+    @classmethod
+    def _metadata_rows(cls, entry) -> List[dict]:
+        chapter = {
+            "genre": entry["textId"]["genre"],
+            "category": int(entry["textId"]["category"]),
+            "index": int(entry["textId"]["index"]),
+            "stage": entry["stage"],
+            "name": entry["name"].strip(),
+        }
+        return [
+            {
+                **chapter,
+                "siglum": to_siglum(manuscript),
+                "provenance": manuscript["provenance"],
+                "period": manuscript["period"],
+                "type": manuscript["type"],
+            }
+            for manuscript in entry["manuscripts"]
+        ] or [chapter]
+
+
+class ManuscriptCorpus(BaseCorpus):
+    _collection = "manuscripts"
+
+    @classmethod
+    def load(cls, *args, **kwargs) -> "ManuscriptCorpus":
+        return ChapterCorpus.load(*args, **kwargs).manuscripts
+
+    @classmethod
+    def from_chapters(cls, chapters: ChapterCorpus) -> "ManuscriptCorpus":
+        corpus = cls._from_documents(
+            [
+                ManuscriptModel(chapter, siglum)
+                for chapter in chapters
+                for siglum in chapter.keys_by_manuscript
+            ],
+            chapters.n_values,
+            chapters.name,
+            chapters.encoder,
+        )
+        corpus.retrieved_on = chapters.retrieved_on
+        return corpus
+
+    @property
+    def manuscripts(self):
+        return self.documents
+
+    @classmethod
+    def _to_index(cls, ids: list) -> pd.Index:
+        return pd.MultiIndex.from_tuples(
+            [tuple(id_) for id_ in ids], names=["chapter", "siglum"]
+        )
+
+    @classmethod
+    def _create_model(cls, entry, n_values, ngram_keys=None):
+        return ManuscriptModel(
+            ChapterModel(entry, n_values=n_values), entry["siglum"], ngram_keys
+        )
+
+    def _record_files(self) -> Dict[str, Iterable[dict]]:
+        positions: Dict[tuple, int] = {}
+        chapters: List[dict] = []
+        references: List[dict] = []
+        for entry in self._records():
+            key = chapter_key(entry)
+            if key not in positions:
+                positions[key] = len(chapters)
+                chapters.append(
+                    {name: value for name, value in entry.items() if name != "siglum"}
+                )
+            references.append({"chapter": positions[key], "siglum": entry["siglum"]})
+        return {storage.RECORDS: references, CHAPTERS: chapters}
+
+    @classmethod
+    def _load_records(cls, path: storage.PathLike) -> ManuscriptRecords:
+        return ManuscriptRecords(
+            storage.load_records(path), storage.load_records(path, CHAPTERS)
+        )
+
+    @classmethod
+    def _record_factory(cls, n_values) -> ManuscriptFactory:
+        return ManuscriptFactory(n_values)
+
+    @classmethod
+    def _open_documents(
+        cls, records: ManuscriptRecords, keys: Sequence[np.ndarray], n_values
+    ) -> List[ManuscriptModel]:
+        references = list(records.references)
+        keys_by_chapter: Dict[int, Dict[str, np.ndarray]] = {}
+        for reference, ngram_keys in zip(references, keys):
+            keys_by_chapter.setdefault(reference["chapter"], {})[
+                reference["siglum"]
+            ] = ngram_keys
+
+        chapters = {}
+        for position, keys_by_manuscript in keys_by_chapter.items():
+            entry = records.chapters[position]
+            sigla = list(join_by_siglum(entry["manuscripts"], entry["signs"]))
+            chapters[position] = ChapterModel(
+                entry,
+                n_values,
+                keys_by_manuscript=(
+                    {siglum: keys_by_manuscript[siglum] for siglum in sigla}
+                    if set(sigla) == set(keys_by_manuscript)
+                    else None
+                ),
+            )
+
+        return [
+            ManuscriptModel(
+                chapters[reference["chapter"]], reference["siglum"], ngram_keys
+            )
+            for reference, ngram_keys in zip(references, keys)
+        ]
+
+    @classmethod
+    def _metadata_rows(cls, entry) -> List[dict]:
+        return [
+            row
+            for row in ChapterCorpus._metadata_rows(entry)
+            if row.get("siglum") == entry["siglum"]
+        ]
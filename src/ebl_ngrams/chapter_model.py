@@ -1,15 +1,23 @@
-from typing import TypedDict
+from copy import copy
+from typing import Dict, List, Optional, TypedDict
+import numpy as np
 import pandas as pd
-import requests
+from ebl_ngrams.api_client import ApiClient, default_client
 from ebl_ngrams.document_model import (
-    API_URL,
     DEFAULT_N_VALUES,
     BaseDocument,
-    ngrams_multi_n,
-    postprocess,
+    extract_keys,
     preprocess,
     validate_n_values,
 )
+from ebl_ngrams.ngram_keys import (
+    EMPTY_KEYS,
+    export_keys,
+    filter_keys,
+    import_keys,
+    merge_keys,
+    unpack,
+)
 from ebl_ngrams.enums.provenance import Provenance
 from ebl_ngrams.enums.stage import Stage
 from ebl_ngrams.enums.manuscript_type import ManuscriptType
@@ -61,6 +69,30 @@ def drop_colophon_lines(frame):
     return frame.loc[frame.line_type != "ColophonLine", "signs"]
 
 
+def strip_colophon(lines: List[str], manuscript: dict) -> List[str]:
+    colophon = manuscript["colophon"]["numberOfLines"]
+    unplaced = manuscript["unplacedLines"]["numberOfLines"]
+    text = max(len(lines) - colophon - unplaced, 0)
+
+    return lines[:text] + lines[text + colophon :]
+
+
+def join_by_siglum(manuscripts: List[dict], signs: List[str]) -> Dict[str, str]:
+    lines_by_siglum: Dict[str, List[str]] = {}
+    for manuscript, manuscript_signs in zip(manuscripts, signs):
+        lines = (
+            strip_colophon(manuscript_signs.split("\n"), manuscript)
+            if isinstance(manuscript_signs, str)
+            else []
+        )
+        if lines:
+            lines_by_siglum.setdefault(to_siglum(manuscript), []).extend(lines)
+
+    return {
+        siglum: "\n".join(lines) for siglum, lines in sorted(lines_by_siglum.items())
+    }
+
+
 class ChapterRecord(TypedDict):
     signs: list
     manuscripts: list
@@ -87,9 +119,16 @@ class TextId:
 
 
 class ChapterModel(BaseDocument):
+    __slots__ = ("text_id", "stage", "name", "_manuscripts", "_keys_by_manuscript")
     _collection = "chapters"
 
-    def __init__(self, data: ChapterRecord, n_values=DEFAULT_N_VALUES):
+    def __init__(
+        self,
+        data: ChapterRecord,
+        n_values=DEFAULT_N_VALUES,
+        ngram_keys: Optional[np.ndarray] = None,
+        keys_by_manuscript: Optional[Dict[str, np.ndarray]] = None,
+    ):
         self.text_id = TextId(data["textId"])
         self.stage = Stage.from_name(data["stage"])
         self.name = data["name"].strip()
@@ -97,23 +136,30 @@ class ChapterModel(BaseDocument):
         super().__init__(self._create_id(data), data["signs"], n_values)
 
         self._manuscripts = data["manuscripts"]
-        self.set_ngrams(*n_values)
+        self._keys_by_manuscript = keys_by_manuscript
+        if ngram_keys is not None:
+            self.ngram_keys = ngram_keys
+        elif keys_by_manuscript is not None:
+            self.ngram_keys = merge_keys(list(keys_by_manuscript.values()))
+        else:
+            self.set_ngrams(*n_values)
 
     @classmethod
     def load(
-        cls, url: str, n_values=DEFAULT_N_VALUES, db="ebldev", uri=None
+        cls,
+        url: str,
+        n_values=DEFAULT_N_VALUES,
+        db="ebldev",
+        uri=None,
+        client: Optional[ApiClient] = None,
     ) -> "ChapterModel":
+        data = (client or default_client()).get_json(cls._create_api_url(url))
 
-        response = requests.get(cls._create_api_url(url))
-        response.raise_for_status()
-
-        return cls(response.json(), n_values)
+        return cls(data, n_values)
 
     @staticmethod
     def _create_api_url(url: str) -> str:
-        return "{}{}/{}/{}/chapters/{}/{}/signs".format(
-            f"{API_URL}/texts/", *url.split("/")[-5:]
-        )
+        return "texts/{}/{}/{}/chapters/{}/{}/signs".format(*url.split("/")[-5:])
 
     def _create_id(self, data: dict) -> str:
         return "/".join(
@@ -132,40 +178,64 @@ class ChapterModel(BaseDocument):
 
     def set_ngrams(self, *n_values) -> "ChapterModel":
         self.n_values = validate_n_values(n_values) if n_values else self.n_values
-        df = (
-            pd.DataFrame({"manuscript": self._manuscripts, "signs": self.signs})
-            .pipe(set_sigla)
-            .pipe(drop_colophon_lines)
-        )
+        self._keys_by_manuscript = self._extract_keys_by_manuscript()
+        self.ngram_keys = merge_keys(list(self._keys_by_manuscript.values()))
+        return self
 
-        self.ngrams_by_manuscript = (
-            df.groupby(level=0)
-            .agg("\n".join)
-            .map(
-                lambda signs: postprocess(
-                    ngrams_multi_n(preprocess(signs), *self.n_values)
-                )
-            )
-            .to_dict()
-        )
+    def _extract_keys_by_manuscript(self) -> Dict[str, np.ndarray]:
+        return {
+            siglum: extract_keys(preprocess(signs), *self.n_values)
+            for siglum, signs in join_by_siglum(self._manuscripts, self.signs).items()
+        }
 
-        self.ngrams = (
-            set.union(*ngrams.values())
-            if (ngrams := self.ngrams_by_manuscript)
-            else set()
-        )
-        return self
+    @property
+    def keys_by_manuscript(self) -> Dict[str, np.ndarray]:
+        if self._keys_by_manuscript is None:
+            self._keys_by_manuscript = self._extract_keys_by_manuscript()
+        return self._keys_by_manuscript
 
-    def get_manuscript_ngrams(self, siglum: str, *n_values):
-        return (
-            {
-                ngram
-                for ngram in self.ngrams_by_manuscript[siglum]
-                if len(ngram) in n_values
+    @property
+    def ngrams_by_manuscript(self) -> Dict[str, set]:
+        return {
+            siglum: unpack(keys) for siglum, keys in self.keys_by_manuscript.items()
+        }
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        if state.get("_keys_by_manuscript") is not None:
+            state["_keys_by_manuscript"] = {
+                siglum: export_keys(keys)
+                for siglum, keys in self._keys_by_manuscript.items()
             }
-            if n_values
-            else self.ngrams_by_manuscript[siglum]
-        )
+        return state
+
+    def __setstate__(self, state: dict):
+        super().__setstate__(state)
+        if state.get("_keys_by_manuscript") is not None:
+            self._keys_by_manuscript = {
+                siglum: import_keys(*keys)
+                for siglum, keys in state["_keys_by_manuscript"].items()
+            }
+
+    def to_record(self) -> ChapterRecord:
+        return {
+            "signs": self.signs,
+            "manuscripts": self._manuscripts,
+            "textId": {
+                "genre": self.genre,
+                "category": self.category,
+                "index": self.index,
+            },
+            "stage": self.stage.long_name,
+            "name": self.name,
+        }
+
+    def get_manuscript_keys(self, siglum: str, *n_values) -> np.ndarray:
+        keys = self.keys_by_manuscript[siglum]
+        return filter_keys(keys, n_values) if n_values else keys
+
+    def get_manuscript_ngrams(self, siglum: str, *n_values):
+        return unpack(self.get_manuscript_keys(siglum, *n_values))
 
     @property
     def genre(self) -> str:
@@ -178,3 +248,41 @@ class ChapterModel(BaseDocument):
     @property
     def index(self) -> int:
         return self.text_id.index
+
+
+class ManuscriptModel(BaseDocument):
+    __slots__ = ("chapter", "siglum")
+    _collection = "manuscripts"
+
+    def __init__(
+        self,
+        chapter: ChapterModel,
+        siglum: str,
+        ngram_keys: Optional[np.ndarray] = None,
+    ):
+        self.chapter = chapter
+        self.siglum = siglum
+        super().__init__(
+            (chapter.id_, siglum),
+            "\n".join(
+                signs
+                for manuscript, signs in zip(chapter._manuscripts, chapter.signs)
+                if signs is not None and to_siglum(manuscript) == siglum
+            ),
+            chapter.n_values,
+        )
+        self.retrieved_on = chapter.retrieved_on
+        if ngram_keys is None:
+            self.set_ngrams()
+        else:
+            self.ngram_keys = ngram_keys
+
+    def set_ngrams(self, *n_values) -> "ManuscriptModel":
+        if n_values:
+            self.chapter = copy(self.chapter).set_ngrams(*n_values)
+        self.n_values = self.chapter.n_values
+        self.ngram_keys = self.chapter.keys_by_manuscript.get(self.siglum, EMPTY_KEYS)
+        return self
+
+    def to_record(self) -> dict:
+        return {**self.chapter.to_record(), "siglum": self.siglum}
@@ -1,17 +1,34 @@
 from abc import ABC, abstractmethod
 import datetime
-from functools import singledispatchmethod
-from itertools import tee
+from functools import partial, singledispatchmethod
 import json
 import re
-from typing import Sequence, Set, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
 
+import numpy as np
+
+from ebl_ngrams.api_client import (
+    API_URL,
+    DEFAULT_WORKERS,
+    ApiClient,
+    call_safely,
+    map_concurrently,
+)
 from ebl_ngrams.metrics import no_weight, weight_by_len
+from ebl_ngrams.ngram_keys import (
+    SIGNS,
+    export_keys,
+    filter_keys,
+    import_keys,
+    pack,
+    signs_of,
+    unpack,
+    window_keys,
+)
 
 UNKNOWN_SIGN = "X"
 LINE_SEP = "#"
 DEFAULT_N_VALUES = (1, 2, 3)
-API_URL = "https://www.ebl.lmu.de/api/"
 
 NGramSet = Set[Tuple[str]]
 
@@ -25,12 +42,7 @@ def validate_n_values(n_values: Sequence[int]) -> Sequence[int]:
 
 
 def ngrams(signs: Sequence[str], n) -> Set[Tuple[str]]:
-    iterables = tee(signs, n)
-
-    for i, sub_iterable in enumerate(iterables):
-        for _ in range(i):
-            next(sub_iterable, None)
-    return set(zip(*iterables))
+    return set(zip(*(signs[i:] for i in range(n))))
 
 
 def ngrams_multi_n(signs: Sequence[str], *n_values) -> NGramSet:
@@ -38,6 +50,11 @@ def ngrams_multi_n(signs: Sequence[str], *n_values) -> NGramSet:
     return set.union(*(ngrams(signs, n_) for n_ in n_values))
 
 
+def extract_keys(signs: Sequence[str], *n_values) -> np.ndarray:
+    validate_n_values(n_values)
+    return window_keys(SIGNS.intern_many(signs), n_values, SIGNS.intern(UNKNOWN_SIGN))
+
+
 def preprocess(signs: str) -> Sequence[str]:
     lines = [line.strip() for line in signs.split("\n")]
     lines = [
@@ -49,10 +66,17 @@ def preprocess(signs: str) -> Sequence[str]:
 
 
 def postprocess(ngrams: NGramSet) -> NGramSet:
-    return {ngram for ngram in ngrams if "X" not in ngram}
+    return {ngram for ngram in ngrams if UNKNOWN_SIGN not in ngram}
+
+
+class LoadResult(NamedTuple):
+    documents: List["BaseDocument"]
+    errors: Dict[str, Exception]
 
 
 class BaseDocument(ABC):
+    __slots__ = ("id_", "url", "signs", "n_values", "retrieved_on", "ngram_keys")
+
     def __init__(self, id_: str, signs: str, n_values=DEFAULT_N_VALUES):
         self.id_ = self.url = id_
         self.signs = signs
@@ -65,9 +89,35 @@ class BaseDocument(ABC):
             data = json.load(jf)
         return cls(data, n_values)
 
+    @classmethod
+    def load_many(
+        cls,
+        ids: Sequence[str],
+        n_values=DEFAULT_N_VALUES,
+        client: Optional[ApiClient] = None,
+        workers: int = DEFAULT_WORKERS,
+    ) -> LoadResult:
+        results = map_concurrently(
+            partial(call_safely, cls.load, n_values=n_values, client=client),
+            ids,
+            workers,
+        )
+        errors = {
+            id_: result
+            for id_, result in zip(ids, results)
+            if isinstance(result, Exception)
+        }
+        return LoadResult(
+            [result for result in results if not isinstance(result, Exception)],
+            errors,
+        )
+
     @abstractmethod
     def set_ngrams(self, *n_values) -> "BaseDocument": ...
 
+    @abstractmethod
+    def to_record(self) -> dict: ...
+
     @singledispatchmethod
     def intersection(self, other):
         raise NotImplementedError(
@@ -80,13 +130,47 @@ class BaseDocument(ABC):
             f"Cannot match {type(self).__name__} with {type(other).__name__}"
         )
 
+    @property
+    def ngrams(self) -> NGramSet:
+        return unpack(self.ngram_keys)
+
+    @ngrams.setter
+    def ngrams(self, ngrams: NGramSet):
+        self.ngram_keys = pack(ngrams)
+
+    def get_keys(self, *n_values) -> np.ndarray:
+        return filter_keys(self.ngram_keys, n_values) if n_values else self.ngram_keys
+
     def get_ngrams(self, *n_values) -> set:
-        return (
-            {ngram for ngram in self.ngrams if len(ngram) in n_values}
-            if n_values
-            else self.ngrams
+        return unpack(self.get_keys(*n_values))
+
+    @classmethod
+    def _slots(cls) -> Tuple[str, ...]:
+        return tuple(
+            slot for klass in cls.__mro__ for slot in getattr(klass, "__slots__", ())
         )
 
+    def __copy__(self) -> "BaseDocument":
+        document = type(self).__new__(type(self))
+        for slot in self._slots():
+            if hasattr(self, slot):
+                setattr(document, slot, getattr(self, slot))
+        return document
+
+    def __getstate__(self) -> dict:
+        state = {
+            slot: getattr(self, slot) for slot in self._slots() if hasattr(self, slot)
+        }
+        if "ngram_keys" in state:
+            state["ngram_keys"] = export_keys(self.ngram_keys)
+        return state
+
+    def __setstate__(self, state: dict):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        if "ngram_keys" in state:
+            self.ngram_keys = import_keys(*state["ngram_keys"])
+
     def __str__(self):
         return "<{} {} {}>".format(
             type(self).__name__,
@@ -99,27 +183,29 @@ class BaseDocument(ABC):
 
     @property
     def _vocab(self) -> Set[str]:
-        return {sign for ngram in self.ngrams for sign in ngram}
+        return signs_of(self.ngram_keys)
+
+
+def intersect_keys(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    return np.intersect1d(left, right, assume_unique=True)
 
 
 @BaseDocument.intersection.register
 def _(self: BaseDocument, other: BaseDocument, *n_values) -> set:
-    A = self.get_ngrams(*n_values)
-    B = other.get_ngrams(*n_values)
-
-    return A & B
+    return unpack(intersect_keys(self.get_keys(*n_values), other.get_keys(*n_values)))
 
 
 @BaseDocument.match.register
 def match(
     self: BaseDocument, other: BaseDocument, *n_values, length_weighting=False
 ) -> float:
-    intersection = self.intersection(other, *n_values)
+    self_keys = self.get_keys(*n_values)
+    other_keys = other.get_keys(*n_values)
     weighted_sum = weight_by_len if length_weighting else no_weight
 
-    intersection_size = weighted_sum(intersection)
-    self_size = weighted_sum(self.get_ngrams(*n_values))
-    other_size = weighted_sum(other.get_ngrams(*n_values))
+    intersection_size = weighted_sum(intersect_keys(self_keys, other_keys))
+    self_size = weighted_sum(self_keys)
+    other_size = weighted_sum(other_keys)
 
     return (
         intersection_size / min(self_size, other_size)
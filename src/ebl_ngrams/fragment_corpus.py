@@ -1,4 +1,4 @@
-from typing import Sequence, TypedDict
+from typing import List, Optional, Sequence, TypedDict
 
 from ebl_ngrams.document_model import DEFAULT_N_VALUES
 from ebl_ngrams.base_corpus import BaseCorpus
@@ -20,16 +20,19 @@ class FragmentCorpus(BaseCorpus):
         n_values=DEFAULT_N_VALUES,
         show_progress=False,
         name="",
+        workers: Optional[int] = None,
     ):
 
-        super().__init__(data, n_values, show_progress, name)
-        self._vocab = {
-            sign for fragment in self for ngram in fragment.ngrams for sign in ngram
-        }
+        super().__init__(data, n_values, show_progress, name, workers)
 
     @property
     def fragments(self):
         return self.documents
 
-    def _create_model(self, entry, n_values):
-        return FragmentModel(entry["_id"], entry["signs"], n_values=n_values)
+    @classmethod
+    def _create_model(cls, entry, n_values, ngram_keys=None):
+        return FragmentModel(entry["_id"], entry["signs"], n_values, ngram_keys)
+
+    @classmethod
+    def _metadata_rows(cls, entry) -> List[dict]:
+        return [{"prefix": entry["_id"].split(".")[0]}]
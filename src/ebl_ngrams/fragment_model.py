@@ -1,44 +1,58 @@
-import requests
+from typing import Optional
+
+import numpy as np
+
+from ebl_ngrams.api_client import ApiClient, default_client
 from ebl_ngrams.document_model import (
-    API_URL,
     DEFAULT_N_VALUES,
     BaseDocument,
-    ngrams_multi_n,
+    extract_keys,
     preprocess,
-    postprocess,
     validate_n_values,
 )
 
 
-def fetch_fragment(id_: str):
-    response = requests.get(f"{API_URL}fragments/{id_}")
-    response.raise_for_status()
+def fetch_fragment(id_: str, client: Optional[ApiClient] = None):
+    response = (client or default_client()).get_json(f"fragments/{id_}")
 
-    data = {"signs": response.json()["signs"]}
+    data = {"signs": response["signs"]}
 
     return data
 
 
 class FragmentModel(BaseDocument):
+    __slots__ = ()
     _collection = "fragments"
 
-    def __init__(self, id_: str, signs: str, n_values=DEFAULT_N_VALUES):
+    def __init__(
+        self,
+        id_: str,
+        signs: str,
+        n_values=DEFAULT_N_VALUES,
+        ngram_keys: Optional[np.ndarray] = None,
+    ):
         super().__init__(id_, signs, n_values)
 
-        self.set_ngrams()
+        if ngram_keys is None:
+            self.set_ngrams()
+        else:
+            self.ngram_keys = ngram_keys
 
     @classmethod
-    def load(cls, id_: str, n_values=DEFAULT_N_VALUES) -> "FragmentModel":
+    def load(
+        cls, id_: str, n_values=DEFAULT_N_VALUES, client: Optional[ApiClient] = None
+    ) -> "FragmentModel":
         id_ = id_.split("/")[-1]
-        data = fetch_fragment(id_)
+        data = fetch_fragment(id_, client)
         return cls(id_, data["signs"], n_values)
 
     def set_ngrams(self, *n_values) -> "FragmentModel":
         self.n_values = validate_n_values(n_values) if n_values else self.n_values
-        self.ngrams = postprocess(
-            ngrams_multi_n(preprocess(self.signs), *self.n_values)
-        )
+        self.ngram_keys = extract_keys(preprocess(self.signs), *self.n_values)
         return self
 
+    def to_record(self) -> dict:
+        return {"_id": self.id_, "signs": self.signs}
+
     def __len__(self):
-        return len(self.ngrams)
+        return len(self.ngram_keys)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import requests
+
+DEFAULT_TTL = 24 * 60 * 60
+CHUNK_SIZE = 2**16
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.revalidated + self.misses
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+    def __repr__(self):
+        counts = ", ".join(f"{key}={value}" for key, value in self.as_dict().items())
+        return f"<{type(self).__name__} {counts}>"
+
+
+class ResponseCache:
+    def __init__(self, path: PathLike, ttl: float = DEFAULT_TTL):
+        self.path = Path(path).expanduser()
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, url: str, suffix: str) -> Path:
+        return self.path / (hashlib.sha256(url.encode()).hexdigest() + suffix)
+
+    def entry(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._file(url, ".meta.json"), encoding="utf-8") as jf:
+                entry = json.load(jf)
+        except (OSError, ValueError):
+            return None
+        return entry if self._file(url, ".body").exists() else None
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["stored_on"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url: str, outcome="hits") -> Iterator[bytes]:
+        self.stats.record(outcome)
+        logger.debug("cache %s: %s", outcome, url)
+        return self._read_body(url)
+
+    def _read_body(self, url: str) -> Iterator[bytes]:
+        with open(self._file(url, ".body"), "rb") as body:
+            yield from iter(lambda: body.read(CHUNK_SIZE), b"")
+
+    def revalidate(self, url: str, entry: dict) -> Iterator[bytes]:
+        self._write_entry(url, {**entry, "stored_on": time.time()})
+        return self.read(url, "revalidated")
+
+    def write(self, url: str, response: requests.Response) -> Iterator[bytes]:
+        self.stats.record("misses")
+        logger.debug("cache misses: %s", url)
+        return self._write_body(url, response)
+
+    def _write_body(self, url: str, response: requests.Response) -> Iterator[bytes]:
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as body:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    body.write(chunk)
+                    yield chunk
+            os.replace(temporary, self._file(url, ".body"))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        self._write_entry(
+            url,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored_on": time.time(),
+            },
+        )
+
+    def _write_entry(self, url: str, entry: dict) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(descriptor, "w", encoding="utf-8") as jf:
+            json.dump(entry, jf)
+        os.replace(temporary, self._file(url, ".meta.json"))
+
+    def clear(self) -> None:
+        for file in self.path.glob("*.body"):
+            file.unlink()
+        for file in self.path.glob("*.meta.json"):
+            file.unlink()
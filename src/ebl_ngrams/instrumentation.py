@@ -0,0 +1,122 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+
+class Event(NamedTuple):
+    name: str
+    path: Tuple[str, ...]
+    seconds: float
+    counts: Dict[str, Any]
+    memory: Optional[int]
+
+    def to_dict(self) -> dict:
+        return {**self._asdict(), "path": "/".join(self.path)}
+
+
+Listener = Callable[[Event], None]
+
+_listeners: List[Listener] = []
+_local = threading.local()
+
+
+def add_listener(listener: Listener) -> Listener:
+    _listeners.append(listener)
+    return listener
+
+
+def remove_listener(listener: Listener) -> None:
+    _listeners.remove(listener)
+
+
+def enabled() -> bool:
+    return bool(_listeners)
+
+
+def _stack() -> List[str]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextmanager
+def stage(name: str, **counts: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    if not _listeners:
+        yield None
+        return
+
+    stack = _stack()
+    stack.append(name)
+    memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    start = time.perf_counter()
+    try:
+        yield counts
+        seconds = time.perf_counter() - start
+        if memory is not None:
+            memory = tracemalloc.get_traced_memory()[0] - memory
+        event = Event(name, tuple(stack), seconds, counts, memory)
+    finally:
+        stack.pop()
+
+    for listener in list(_listeners):
+        listener(event)
+
+
+class StatsCollector:
+    def __init__(self):
+        self.events: List[Event] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.events = []
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([event.to_dict() for event in self.events])
+
+    def summary(self) -> pd.DataFrame:
+        if not self.events:
+            return pd.DataFrame(columns=["calls", "seconds", "mean_seconds"])
+
+        frame = pd.DataFrame(
+            [
+                {"path": "/".join(event.path), "seconds": event.seconds, **event.counts}
+                for event in self.events
+            ]
+        )
+        grouped = frame.groupby("path", sort=False)
+        return (
+            grouped.seconds.agg(calls="count", seconds="sum", mean_seconds="mean")
+            .join(grouped.sum(numeric_only=True).drop(columns="seconds"))
+            .sort_values("seconds", ascending=False)
+        )
+
+
+@contextmanager
+def collect_stats() -> Iterator[StatsCollector]:
+    collector = add_listener(StatsCollector())
+    try:
+        yield collector
+    finally:
+        remove_listener(collector)
+
+
+def log_events(logger: Optional[logging.Logger] = None, level=logging.INFO) -> Listener:
+    logger = logger or logging.getLogger("ebl_ngrams")
+
+    def log(event: Event) -> None:
+        if logger.isEnabledFor(level):
+            data = event.to_dict()
+            logger.log(level, json.dumps(data, default=str), extra={"ebl_ngrams": data})
+
+    return log
@@ -0,0 +1,137 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ebl_ngrams.ngram_keys import (
+    EMPTY_KEYS,
+    KEY_DTYPE,
+    decode_table,
+    encode_ngrams,
+    export_keys,
+    merge_keys,
+)
+
+UNKNOWN = -1
+MIN_TAIL = 1024
+
+
+class IntegerEncoder:
+    def __init__(self, items: Optional[Iterable] = None):
+        self._set_keys(
+            EMPTY_KEYS if items is None else merge_keys([as_keys(items)]), False
+        )
+
+    @classmethod
+    def from_vocabulary(cls, items: Iterable) -> "IntegerEncoder":
+        encoder = cls.__new__(cls)
+        encoder._set_keys(as_keys(items), False)
+        return encoder
+
+    def _set_keys(self, keys: np.ndarray, frozen: bool) -> None:
+        self._keys = np.array(keys, dtype=KEY_DTYPE)
+        self._size = len(keys)
+        self.frozen = frozen
+        self._index()
+
+    def _index(self) -> None:
+        keys = self.keys
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted = keys[self._order]
+        self._tail = {}
+
+    def __getstate__(self) -> dict:
+        return {"keys": export_keys(self.keys), "frozen": self.frozen}
+
+    def __setstate__(self, state: dict) -> None:
+        self._set_keys(decode_table(*state["keys"]), state["frozen"])
+
+    @property
+    def keys(self) -> np.ndarray:
+        keys = self._keys[: self._size]
+        keys.flags.writeable = False
+        return keys
+
+    @property
+    def vocabulary(self) -> list:
+        return self.keys.tolist()
+
+    @property
+    def items(self):
+        return set(self.vocabulary)
+
+    def freeze(self) -> "IntegerEncoder":
+        self.frozen = True
+        return self
+
+    def _check_mutable(self) -> None:
+        if self.frozen:
+            raise ValueError("Cannot add items to a frozen encoder.")
+
+    def _append(self, keys: np.ndarray) -> None:
+        size = self._size + len(keys)
+        if size > len(self._keys):
+            grown = np.empty(max(size, 2 * len(self._keys)), dtype=KEY_DTYPE)
+            grown[: self._size] = self.keys
+            self._keys = grown
+        self._keys[self._size : size] = keys
+        self._size = size
+
+    def add_item(self, item):
+        self._check_mutable()
+        key = as_keys([item])
+        if self.encode_array(key)[0] == UNKNOWN:
+            self._tail[int(key[0])] = self._size
+            self._append(key)
+            if len(self._tail) > max(MIN_TAIL, self._size // 8):
+                self._index()
+
+    def update(self, items):
+        self._check_mutable()
+        items = merge_keys([as_keys(items)])
+        self._append(items[self.encode_array(items) == UNKNOWN])
+        self._index()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item):
+        return self.encode_array(as_keys([item]))[0] != UNKNOWN
+
+    def decode(self, key):
+        if not 0 <= key < self._size:
+            raise KeyError(key)
+        return int(self._keys[key])
+
+    def decode_array(self, ids: np.ndarray) -> np.ndarray:
+        return self.keys[ids]
+
+    def encode(self, item):
+        key = self.encode_array(as_keys([item]))[0]
+        if key == UNKNOWN:
+            raise KeyError(item)
+        return int(key)
+
+    def encode_many(self, items):
+        return set(map(self.encode, items))
+
+    def encode_array(self, items: np.ndarray) -> np.ndarray:
+        items = as_keys(items)
+        positions = np.searchsorted(self._sorted, items)
+        found = positions < len(self._sorted)
+        found[found] = self._sorted[positions[found]] == items[found]
+
+        ids = np.full(len(items), UNKNOWN, dtype=np.int64)
+        ids[found] = self._order[positions[found]]
+        if self._tail:
+            for position in np.flatnonzero(~found):
+                ids[position] = self._tail.get(int(items[position]), UNKNOWN)
+        return ids
+
+
+def as_keys(items: Iterable) -> np.ndarray:
+    if isinstance(items, np.ndarray):
+        return items.astype(KEY_DTYPE, copy=False)
+    items = list(items)
+    if items and all(isinstance(item, tuple) for item in items):
+        return encode_ngrams(items)
+    return np.array(items, dtype=KEY_DTYPE)
@@ -0,0 +1,110 @@
+from typing import Callable, Dict, Sequence, Tuple
+
+import numpy as np
+
+from ebl_ngrams.ngram_matrix import NGramMatrix, column_weights, select_top_k
+
+
+def gather_ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class InvertedIndex:
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        postings: np.ndarray,
+        lengths: np.ndarray,
+        n_documents: int,
+    ):
+        self.indptr = indptr
+        self.postings = postings
+        self.lengths = lengths
+        self.n_documents = n_documents
+        self._sizes: Dict[Tuple[Tuple[int, ...], bool], np.ndarray] = {}
+        self._min_sizes: Dict[Tuple[Tuple[int, ...], bool], np.ndarray] = {}
+
+    @classmethod
+    def from_matrix(cls, matrix: NGramMatrix) -> "InvertedIndex":
+        csc = matrix.matrix.tocsc()
+        csc.sort_indices()
+        return cls(
+            csc.indptr.astype(np.int64), csc.indices, matrix.lengths, len(matrix)
+        )
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def get_postings(self, key: int) -> np.ndarray:
+        return self.postings[self.indptr[key] : self.indptr[key + 1]]
+
+    def posting_lengths(self, keys: np.ndarray) -> np.ndarray:
+        return self.indptr[keys + 1] - self.indptr[keys]
+
+    def sizes(self, n_values: Sequence[int], length_weighting=False) -> np.ndarray:
+        key = (tuple(sorted(n_values)), length_weighting)
+        if key not in self._sizes:
+            weights = column_weights(self.lengths, n_values, length_weighting)
+            self._sizes[key] = np.bincount(
+                self.postings,
+                weights=np.repeat(weights, np.diff(self.indptr)),
+                minlength=self.n_documents,
+            )
+        return self._sizes[key]
+
+    def intersection_sizes(
+        self, query: np.ndarray, weights: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query = query[weights[query] > 0]
+        positions = gather_ranges(self.indptr[query], self.indptr[query + 1])
+        documents, inverse = np.unique(self.postings[positions], return_inverse=True)
+        sizes = np.bincount(
+            inverse,
+            weights=np.repeat(weights[query], self.posting_lengths(query)),
+            minlength=len(documents),
+        )
+        return documents, sizes
+
+    def min_sizes(self, n_values: Sequence[int], length_weighting=False) -> np.ndarray:
+        key = (tuple(sorted(n_values)), length_weighting)
+        if key not in self._min_sizes:
+            sizes = self.sizes(n_values, length_weighting)[self.postings]
+            nonempty = np.diff(self.indptr) > 0
+            min_sizes = np.full(len(self), np.inf)
+            if nonempty.any():
+                min_sizes[nonempty] = np.minimum.reduceat(
+                    sizes, self.indptr[:-1][nonempty]
+                )
+            self._min_sizes[key] = min_sizes
+        return self._min_sizes[key]
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        upper_bounds: np.ndarray,
+        score: Callable[[np.ndarray], np.ndarray],
+        k: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(-upper_bounds, kind="stable")
+        query, upper_bounds = query[order], upper_bounds[order]
+        remaining = np.append(np.cumsum(upper_bounds[::-1])[::-1], 0.0)
+
+        documents = np.array([], dtype=self.postings.dtype)
+        scores = np.array([], dtype=float)
+        start, batch_size = 0, 1
+
+        while start < len(query):
+            if len(scores) >= k and remaining[start] < np.partition(scores, -k)[-k]:
+                break
+            terms = query[start : start + batch_size]
+            positions = gather_ranges(self.indptr[terms], self.indptr[terms + 1])
+            candidates = np.setdiff1d(self.postings[positions], documents)
+            documents = np.concatenate([documents, candidates])
+            scores = np.concatenate([scores, score(candidates)])
+            start += batch_size
+            batch_size *= 2
+
+        selection = select_top_k(scores, k)
+        return documents[selection], scores[selection]
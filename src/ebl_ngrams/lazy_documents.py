@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Callable, Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ebl_ngrams.document_model import BaseDocument
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def select_records(records: Sequence[dict], positions: np.ndarray) -> Sequence[dict]:
+    if isinstance(records, list):
+        return [records[position] for position in positions]
+    return records[positions]
+
+
+class RecordChain(Sequence):
+    def __init__(self, parts: Sequence[Sequence[dict]]):
+        self.parts = [part for part in parts if len(part)]
+        self._offsets = np.cumsum([0, *map(len, self.parts)])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def _locate(self, positions: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self._offsets, positions, side="right") - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            position = range(len(self))[key]
+            part = self._locate(position)
+            return self.parts[part][position - self._offsets[part]]
+
+        positions = np.arange(len(self))[key]
+        parts = self._locate(positions)
+        starts = np.flatnonzero(np.diff(parts, prepend=-1))
+        return RecordChain(
+            [
+                select_records(
+                    self.parts[parts[start]], run - self._offsets[parts[start]]
+                )
+                for start, run in zip(starts, np.split(positions, starts[1:]))
+            ]
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        return chain.from_iterable(self.parts)
+
+
+class LazyDocuments:
+    def __init__(
+        self,
+        index: pd.Index,
+        records: Sequence[dict],
+        factory: Callable[[dict], BaseDocument],
+        name="",
+        cache_size=DEFAULT_CACHE_SIZE,
+    ):
+        self.index = index
+        self.records = records
+        self.name = name
+        self._factory = factory
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[int, BaseDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get(self, position: int) -> BaseDocument:
+        with self._lock:
+            if position in self._cache:
+                self._cache.move_to_end(position)
+                return self._cache[position]
+
+        document = self._factory(self.records[position])
+        with self._lock:
+            document = self._cache.setdefault(position, document)
+            self._cache.move_to_end(position)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return document
+
+    def _select(self, positions: np.ndarray) -> "LazyDocuments":
+        return LazyDocuments(
+            self.index[positions],
+            select_records(self.records, positions),
+            self._factory,
+            self.name,
+            self._cache_size,
+        )
+
+    def append(self, documents: pd.Series) -> "LazyDocuments":
+        return LazyDocuments(
+            self.index.append(documents.index),
+            RecordChain(
+                [
+                    *(
+                        self.records.parts
+                        if isinstance(self.records, RecordChain)
+                        else [self.records]
+                    ),
+                    [document.to_record() for document in documents],
+                ]
+            ),
+            self._factory,
+            self.name,
+            self._cache_size,
+        )
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name} ({len(self)} documents)>"
+
+    def __iter__(self) -> Iterator[BaseDocument]:
+        return (self._get(position) for position in range(len(self)))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._select(np.arange(len(self))[key])
+        if isinstance(key, (pd.Series, np.ndarray, list)):
+            key = np.asarray(key)
+            if key.dtype == bool:
+                return self._select(np.flatnonzero(key))
+            positions = self.index.get_indexer_for(key)
+            if (positions == -1).any():
+                missing = key[~pd.Index(key).isin(self.index)]
+                raise KeyError(f"{missing.tolist()} not in index")
+            return self._select(positions)
+        return self._get(self.index.get_loc(key))
+
+    @property
+    def loc(self) -> "LazyDocuments":
+        return self
+
+    @property
+    def iloc(self) -> "_PositionalIndexer":
+        return _PositionalIndexer(self)
+
+    @property
+    def values(self) -> np.ndarray:
+        values = np.empty(len(self), dtype=object)
+        values[:] = self.to_list()
+        return values
+
+    def to_list(self) -> List[BaseDocument]:
+        return list(self)
+
+    def to_series(self) -> pd.Series:
+        return pd.Series(self.to_list(), index=self.index, name=self.name)
+
+    def map(self, func: Callable[[BaseDocument], Any]) -> pd.Series:
+        return pd.Series([func(document) for document in self], index=self.index)
+
+
+class _PositionalIndexer:
+    def __init__(self, documents: LazyDocuments):
+        self._documents = documents
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._documents._get(int(key) % len(self._documents))
+        return self._documents._select(np.arange(len(self._documents))[key])
@@ -0,0 +1,24 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from ebl_ngrams.enums.named_enum import NamedEnum
+
+
+def metadata_value(value: Any) -> Any:
+    return value.long_name if isinstance(value, NamedEnum) else value
+
+
+def match_metadata(column: pd.Series, value: Any) -> np.ndarray:
+    if callable(value):
+        return np.asarray(value(column), dtype=bool)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return column.isin([metadata_value(item) for item in value]).to_numpy()
+    return (column == metadata_value(value)).to_numpy()
+
+
+def any_by_document(rows: np.ndarray, positions: np.ndarray, size: int) -> np.ndarray:
+    mask = np.zeros(size, dtype=bool)
+    mask[positions[rows]] = True
+    return mask
@@ -1,11 +1,14 @@
 from functools import singledispatch
+import numpy as np
 import pandas as pd
 
+from ebl_ngrams.ngram_keys import key_lengths
+
 
 @singledispatch
 def weight_by_len(ngrams):
     raise NotImplementedError(
-        f"Can only weight Series, DataFrame or set, got {type(ngrams)} instead"
+        f"Can only weight Series, DataFrame, set or array, got {type(ngrams)} instead"
     )
 
 
@@ -14,6 +17,11 @@ def _(ngrams: set) -> int:
     return sum(len(ngram) ** 2 for ngram in ngrams)
 
 
+@weight_by_len.register
+def _(ngrams: np.ndarray) -> int:
+    return int((key_lengths(ngrams) ** 2).sum())
+
+
 @weight_by_len.register(pd.Series)
 @weight_by_len.register(pd.DataFrame)
 def _(ngrams) -> int:
@@ -23,7 +31,7 @@ def _(ngrams) -> int:
 @singledispatch
 def no_weight(ngrams):
     raise NotImplementedError(
-        f"Can only weight Series, DataFrame or set, got {type(ngrams)} instead"
+        f"Can only weight Series, DataFrame, set or array, got {type(ngrams)} instead"
     )
 
 
@@ -32,6 +40,11 @@ def _(ngrams: set) -> int:
     return len(ngrams)
 
 
+@no_weight.register
+def _(ngrams: np.ndarray) -> int:
+    return len(ngrams)
+
+
 @no_weight.register(pd.Series)
 @no_weight.register(pd.DataFrame)
 def _(ngrams) -> int:
@@ -0,0 +1,261 @@
+import threading
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+KEY_BITS = 64
+LENGTH_BITS = 3
+LONG_N = 2**LENGTH_BITS - 1
+LENGTH_SHIFT = KEY_BITS - LENGTH_BITS
+SIGN_BITS = LENGTH_SHIFT - 1
+INTERNED = 2**SIGN_BITS
+PAD = -1
+
+KEY_DTYPE = np.uint64
+EMPTY_KEYS = np.array([], dtype=KEY_DTYPE)
+
+
+class SignVocabulary:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._signs: List[str] = []
+        self._array = np.array([], dtype=object)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signs)
+
+    def intern(self, sign: str) -> int:
+        id_ = self._ids.get(sign)
+        if id_ is None:
+            with self._lock:
+                id_ = self._ids.get(sign)
+                if id_ is None:
+                    id_ = len(self._signs)
+                    self._signs.append(sign)
+                    self._ids[sign] = id_
+        return id_
+
+    def intern_many(self, signs: Iterable[str]) -> np.ndarray:
+        return np.fromiter(map(self.intern, signs), dtype=KEY_DTYPE)
+
+    def decode(self, ids: np.ndarray) -> np.ndarray:
+        array = self._array
+        if len(array) != len(self._signs):
+            with self._lock:
+                array = self._array = np.array(self._signs, dtype=object)
+        return array[ids.astype(np.intp)]
+
+
+class NGramVocabulary:
+    def __init__(self):
+        self._ids: Dict[Tuple[int, ...], int] = {}
+        self._ngrams: List[Tuple[int, ...]] = []
+        self._lengths = np.array([], dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ngrams)
+
+    def intern(self, sign_ids: Tuple[int, ...]) -> int:
+        id_ = self._ids.get(sign_ids)
+        if id_ is None:
+            with self._lock:
+                id_ = self._ids.get(sign_ids)
+                if id_ is None:
+                    id_ = len(self._ngrams)
+                    self._ngrams.append(sign_ids)
+                    self._ids[sign_ids] = id_
+        return id_
+
+    def intern_many(self, sign_ids: np.ndarray) -> np.ndarray:
+        return np.fromiter(
+            map(self.intern, map(tuple, sign_ids.tolist())), dtype=KEY_DTYPE
+        )
+
+    def sign_ids(self, ids: np.ndarray, n: int) -> np.ndarray:
+        return np.array(
+            [self._ngrams[id_] for id_ in ids.tolist()], dtype=KEY_DTYPE
+        ).reshape(len(ids), n)
+
+    def lengths(self, ids: np.ndarray) -> np.ndarray:
+        lengths = self._lengths
+        if len(lengths) != len(self._ngrams):
+            with self._lock:
+                lengths = self._lengths = np.array(
+                    [len(ngram) for ngram in self._ngrams], dtype=np.int64
+                )
+        return lengths[ids.astype(np.intp)]
+
+
+SIGNS = SignVocabulary()
+NGRAMS = NGramVocabulary()
+
+
+def sign_bits(n: int) -> int:
+    if n <= 0:
+        raise ValueError(f"n must be greater than zero, got {n}.")
+    return SIGN_BITS // n if n < LONG_N else 0
+
+
+def join(sign_ids: np.ndarray) -> np.ndarray:
+    n = sign_ids.shape[1]
+    bits = sign_bits(n)
+    keys = np.full(len(sign_ids), min(n, LONG_N), dtype=KEY_DTYPE) << KEY_DTYPE(
+        LENGTH_SHIFT
+    )
+    if bits and sign_ids.max(initial=0) < 2**bits:
+        packed = slice(None)
+    else:
+        packed = (sign_ids < 2**bits).all(axis=1) & (bits > 0)
+        keys[~packed] |= KEY_DTYPE(INTERNED) | NGRAMS.intern_many(sign_ids[~packed])
+    for position in range(n if bits else 0):
+        shift = KEY_DTYPE(bits * (n - 1 - position))
+        keys[packed] |= sign_ids[packed, position].astype(KEY_DTYPE) << shift
+    return keys
+
+
+def is_interned(keys: np.ndarray) -> np.ndarray:
+    return (keys & KEY_DTYPE(INTERNED)) > 0
+
+
+def split(keys: np.ndarray, n: int) -> np.ndarray:
+    bits = sign_bits(n)
+    interned = is_interned(keys)
+    sign_ids = np.empty((len(keys), n), dtype=KEY_DTYPE)
+    if bits:
+        mask = KEY_DTYPE(2**bits - 1)
+        for position in range(n):
+            shift = KEY_DTYPE(bits * (n - 1 - position))
+            sign_ids[:, position] = (keys >> shift) & mask
+    if interned.any():
+        sign_ids[interned] = NGRAMS.sign_ids(
+            keys[interned] & KEY_DTYPE(INTERNED - 1), n
+        )
+    return sign_ids
+
+
+def key_lengths(keys: np.ndarray) -> np.ndarray:
+    keys = np.asarray(keys, dtype=KEY_DTYPE)
+    lengths = (keys >> KEY_DTYPE(LENGTH_SHIFT)).astype(np.int64)
+    long = lengths == LONG_N
+    if long.any():
+        lengths[long] = NGRAMS.lengths(keys[long] & KEY_DTYPE(INTERNED - 1))
+    return lengths
+
+
+def group_by_length(keys: np.ndarray) -> Iterable[Tuple[int, np.ndarray]]:
+    lengths = key_lengths(keys)
+    for n in np.unique(lengths):
+        yield int(n), keys[lengths == n]
+
+
+def merge_keys(keys: Sequence[np.ndarray]) -> np.ndarray:
+    merged = np.sort(np.concatenate([*keys, EMPTY_KEYS]))
+    return merged[np.concatenate(([True], merged[1:] != merged[:-1]))[: len(merged)]]
+
+
+def filter_keys(sorted_keys: np.ndarray, n_values: Sequence[int]) -> np.ndarray:
+    n_values = {n for n in n_values if n > 0}
+    lengths = np.array(
+        sorted(n for n in n_values if n < LONG_N), dtype=KEY_DTYPE
+    ) << KEY_DTYPE(LENGTH_SHIFT)
+    starts = np.searchsorted(sorted_keys, lengths)
+    stops = np.searchsorted(
+        sorted_keys, lengths | KEY_DTYPE(2**LENGTH_SHIFT - 1), side="right"
+    )
+    buckets = stops > starts
+    starts, stops = starts[buckets], stops[buckets]
+
+    long_n = [n for n in n_values if n >= LONG_N]
+    if long_n:
+        long_keys = sorted_keys[
+            np.searchsorted(sorted_keys, KEY_DTYPE(LONG_N) << KEY_DTYPE(LENGTH_SHIFT)) :
+        ]
+        long_keys = long_keys[np.isin(key_lengths(long_keys), long_n)]
+    else:
+        long_keys = EMPTY_KEYS
+
+    if len(starts) and not len(long_keys) and (starts[1:] == stops[:-1]).all():
+        return sorted_keys[starts[0] : stops[-1]]
+    return np.concatenate(
+        [
+            *(sorted_keys[start:stop] for start, stop in zip(starts, stops)),
+            long_keys,
+        ]
+    )
+
+
+def window_keys(sign_ids: np.ndarray, n_values: Sequence[int], skip: int) -> np.ndarray:
+    skipped = np.zeros(len(sign_ids) + 1, dtype=np.int64)
+    np.cumsum(sign_ids == skip, out=skipped[1:])
+
+    keys = [
+        join(sliding_window_view(sign_ids, n)[skipped[n:] == skipped[:-n]])
+        for n in set(n_values)
+        if n <= len(sign_ids)
+    ]
+    return merge_keys(keys)
+
+
+def encode_ngrams(ngrams: Iterable[Tuple[str, ...]]) -> np.ndarray:
+    positions: Dict[int, List[int]] = {}
+    by_length: Dict[int, List[Tuple[str, ...]]] = {}
+    for position, ngram in enumerate(ngrams):
+        positions.setdefault(len(ngram), []).append(position)
+        by_length.setdefault(len(ngram), []).append(ngram)
+
+    keys = np.empty(sum(map(len, positions.values())), dtype=KEY_DTYPE)
+    for n, group in by_length.items():
+        keys[positions[n]] = join(
+            SIGNS.intern_many(sign for ngram in group for sign in ngram).reshape(-1, n)
+        )
+    return keys
+
+
+def pack(ngrams: Iterable[Tuple[str, ...]]) -> np.ndarray:
+    return merge_keys([encode_ngrams(ngrams)])
+
+
+def unpack(keys: np.ndarray) -> Set[Tuple[str, ...]]:
+    return {
+        ngram
+        for n, group in group_by_length(keys)
+        for ngram in map(tuple, SIGNS.decode(split(group, n)).tolist())
+    }
+
+
+def signs_of(keys: np.ndarray) -> Set[str]:
+    return {
+        sign
+        for n, group in group_by_length(keys)
+        for sign in SIGNS.decode(np.unique(split(group, n))).tolist()
+    }
+
+
+def export_keys(keys: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    lengths = key_lengths(keys)
+    table = np.full((len(keys), lengths.max(initial=0)), PAD, dtype=np.int64)
+    for n in np.unique(lengths):
+        rows = lengths == n
+        table[rows, :n] = split(keys[rows], n)
+
+    filled = table != PAD
+    sign_ids, table[filled] = np.unique(table[filled], return_inverse=True)
+
+    return SIGNS.decode(sign_ids).tolist(), table.astype(np.int32)
+
+
+def decode_table(signs: Sequence[str], table: np.ndarray) -> np.ndarray:
+    sign_ids = SIGNS.intern_many(signs)
+    lengths = (table != PAD).sum(axis=1)
+    keys = np.empty(len(table), dtype=KEY_DTYPE)
+    for n in np.unique(lengths):
+        rows = lengths == n
+        keys[rows] = join(sign_ids[table[rows, :n]])
+    return keys
+
+
+def import_keys(signs: Sequence[str], table: np.ndarray) -> np.ndarray:
+    return merge_keys([decode_table(signs, table)])
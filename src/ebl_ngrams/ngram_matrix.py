@@ -0,0 +1,259 @@
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from ebl_ngrams.integer_encoder import UNKNOWN
+from ebl_ngrams.ngram_keys import EMPTY_KEYS, KEY_DTYPE, key_lengths
+
+DEFAULT_MEMORY_BUDGET = 2**30
+BYTES_PER_CELL = 17
+TOP_K_BYTES_PER_CELL = 8
+BYTES_PER_COLUMN = 8
+BYTES_PER_QUERY_NONZERO = 24
+
+
+def to_csr(rows: Sequence[np.ndarray], n_columns: int, sort=False) -> sparse.csr_matrix:
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.concatenate(rows).astype(np.int64) if rows else np.array([], np.int64)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(rows), n_columns),
+    )
+    if sort:
+        matrix.sort_indices()
+    return matrix
+
+
+def encode_all(
+    keys_by_document: Iterable[np.ndarray], encoder
+) -> Tuple[np.ndarray, np.ndarray]:
+    keys_by_document = list(keys_by_document)
+    indptr = np.zeros(len(keys_by_document) + 1, dtype=np.int64)
+    np.cumsum([len(keys) for keys in keys_by_document], out=indptr[1:])
+    keys = (
+        np.concatenate(keys_by_document) if keys_by_document else EMPTY_KEYS
+    ).astype(KEY_DTYPE, copy=False)
+    return encoder.encode_array(keys), indptr
+
+
+def split_rows(values: np.ndarray, indptr: np.ndarray) -> List[np.ndarray]:
+    return np.split(values, indptr[1:-1]) if len(indptr) > 1 else []
+
+
+def encode_rows(keys_by_document: Iterable[np.ndarray], encoder) -> sparse.csr_matrix:
+    ids, indptr = encode_all(keys_by_document, encoder)
+    return to_csr(split_rows(ids, indptr), len(encoder), sort=True)
+
+
+def column_weights(
+    lengths: np.ndarray, n_values: Sequence[int], length_weighting=False
+) -> np.ndarray:
+    weights = lengths**2 if length_weighting else np.ones_like(lengths)
+    return np.where(np.isin(lengths, n_values), weights, 0).astype(float)
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerator / denominator
+    return np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def overlap_coefficient(
+    intersection_sizes: np.ndarray, left_sizes: np.ndarray, right_sizes: np.ndarray
+) -> np.ndarray:
+    return safe_divide(intersection_sizes, np.minimum(left_sizes, right_sizes))
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def top_k_by_column(
+    scores: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    negated = np.negative(scores, out=scores)
+    rows = np.argpartition(negated, k - 1, axis=0)[:k].copy()
+    columns = np.broadcast_to(np.arange(scores.shape[1]), rows.shape)
+
+    return rows.ravel(), columns.ravel(), -negated[rows, columns].ravel()
+
+
+class NGramMatrix:
+    def __init__(self, matrix: sparse.csr_matrix, lengths: np.ndarray):
+        self.matrix = matrix
+        self.lengths = lengths
+        self._document_frequencies = None
+
+    @classmethod
+    def from_keys(
+        cls, keys_by_document: Iterable[np.ndarray], encoder
+    ) -> "NGramMatrix":
+        lengths = key_lengths(encoder.keys)
+        return cls(encode_rows(keys_by_document, encoder), lengths)
+
+    def row_keys(self, keys: np.ndarray) -> List[np.ndarray]:
+        rows = np.repeat(np.arange(len(self)), np.diff(self.matrix.indptr))
+        row_keys = keys[self.matrix.indices]
+        row_keys = row_keys[np.lexsort((row_keys, rows))]
+        return split_rows(row_keys, self.matrix.indptr)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def document_frequencies(self) -> np.ndarray:
+        if self._document_frequencies is None:
+            self._document_frequencies = np.bincount(
+                self.matrix.indices, minlength=self.shape[1]
+            )
+        return self._document_frequencies
+
+    def extend(self, rows: sparse.csr_matrix, lengths: np.ndarray) -> "NGramMatrix":
+        n_columns = self.shape[1] + len(lengths)
+        matrix = sparse.vstack(
+            [
+                sparse.csr_matrix(
+                    (self.matrix.data, self.matrix.indices, self.matrix.indptr),
+                    shape=(len(self), n_columns),
+                ),
+                rows,
+            ],
+            format="csr",
+        )
+        extended = NGramMatrix(matrix, np.concatenate([self.lengths, lengths]))
+        extended._document_frequencies = np.bincount(rows.indices, minlength=n_columns)
+        extended._document_frequencies[: self.shape[1]] += self.document_frequencies
+        return extended
+
+    def select(self, rows: np.ndarray) -> "NGramMatrix":
+        return NGramMatrix(self.matrix[rows], self.lengths)
+
+    def column_weights(
+        self, n_values: Sequence[int], length_weighting=False
+    ) -> np.ndarray:
+        return column_weights(self.lengths, n_values, length_weighting)
+
+    def _known(self, ids: np.ndarray) -> np.ndarray:
+        return (ids != UNKNOWN) & (ids < self.shape[1])
+
+    def encode_query(self, keys: np.ndarray, encoder) -> np.ndarray:
+        ids = encoder.encode_array(keys)
+        return np.unique(ids[self._known(ids)])
+
+    def encode_queries(
+        self, keys_by_document: Iterable[np.ndarray], encoder
+    ) -> sparse.csr_matrix:
+        ids, indptr = encode_all(keys_by_document, encoder)
+        known = self._known(ids)
+        offsets = np.concatenate([[0], np.cumsum(known)])[indptr]
+        return to_csr(split_rows(ids[known], offsets), self.shape[1], sort=True)
+
+    def sizes(self, weights: np.ndarray) -> np.ndarray:
+        return self.matrix @ weights
+
+    def intersection_sizes(self, query: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        vector = np.zeros(self.shape[1])
+        vector[query] = weights[query]
+        return self.matrix @ vector
+
+    def row_intersection_sizes(
+        self, rows: np.ndarray, query: np.ndarray, weights: np.ndarray
+    ) -> np.ndarray:
+        vector = np.zeros(self.shape[1])
+        vector[query] = weights[query]
+        return self.matrix[rows] @ vector
+
+    def block_bounds(
+        self,
+        queries: sparse.csr_matrix,
+        memory_budget: int,
+        top_k: Optional[int] = None,
+    ) -> np.ndarray:
+        bytes_per_cell = BYTES_PER_CELL + (0 if top_k is None else TOP_K_BYTES_PER_CELL)
+        costs = np.cumsum(
+            bytes_per_cell * len(self)
+            + BYTES_PER_QUERY_NONZERO * np.diff(queries.indptr)
+        )
+        available = memory_budget - BYTES_PER_COLUMN * self.shape[1]
+
+        bounds = [0]
+        while bounds[-1] < len(costs):
+            offset = costs[bounds[-1] - 1] if bounds[-1] else 0
+            stop = np.searchsorted(costs, offset + available, side="right")
+            bounds.append(max(int(stop), bounds[-1] + 1))
+        return np.array(bounds)
+
+    def intersection_blocks(
+        self, queries: sparse.csr_matrix, weights: np.ndarray, bounds: np.ndarray
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        weights = weights.astype(np.float32)
+
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            block = queries[start:stop]
+            block.data = np.multiply(
+                block.data, weights[block.indices], dtype=np.float32
+            )
+            yield start, (self.matrix @ block.T).astype(
+                np.float32, copy=False
+            ).toarray()
+
+    def match(
+        self,
+        queries: sparse.csr_matrix,
+        weights: np.ndarray,
+        query_sizes: np.ndarray,
+        self_sizes: Optional[np.ndarray] = None,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        top_k: Optional[int] = None,
+    ):
+        shape = (len(self), queries.shape[0])
+        result = np.zeros(shape, dtype=np.float32) if top_k is None else []
+        bounds = self.block_bounds(queries, memory_budget, top_k)
+        query_sizes = np.asarray(query_sizes, dtype=np.float32)
+        if self_sizes is not None:
+            self_sizes = np.asarray(self_sizes, dtype=np.float32)[:, None]
+            denominators = np.empty(
+                (len(self), max(np.diff(bounds), default=0)), dtype=np.float32
+            )
+
+        for start, block in self.intersection_blocks(queries, weights, bounds):
+            stop = start + block.shape[1]
+            if self_sizes is None:
+                denominator = query_sizes[start:stop].copy()
+            else:
+                denominator = denominators[:, : block.shape[1]]
+                denominator[...] = query_sizes[start:stop]
+                np.minimum(denominator, self_sizes, out=denominator)
+            denominator[denominator == 0] = np.inf
+            scores = np.divide(block, denominator, out=block)
+
+            if top_k is None:
+                result[:, start:stop] = scores
+            elif len(self):
+                rows, columns, values = top_k_by_column(scores, top_k)
+                result.append((rows, columns + start, values))
+
+        if top_k is None:
+            return result
+
+        rows, columns, values = (
+            map(np.concatenate, zip(*result)) if result else ([], [], [])
+        )
+        order = np.lexsort((-np.asarray(values), columns))
+        return (
+            np.asarray(rows, dtype=np.int64)[order],
+            np.asarray(columns, dtype=np.int64)[order],
+            np.asarray(values, dtype=np.float32)[order],
+        )
@@ -0,0 +1,148 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from ebl_ngrams.ngram_matrix import DEFAULT_MEMORY_BUDGET, NGramMatrix
+
+SHARDS_PER_WORKER = 4
+
+_attached: Dict[str, Tuple[SharedMemory, np.ndarray]] = {}
+
+
+class SharedArray(NamedTuple):
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _view(memory: SharedMemory, shared: SharedArray) -> np.ndarray:
+    return np.ndarray(shared.shape, np.dtype(shared.dtype), buffer=memory.buf)
+
+
+def allocate(
+    shape: Tuple[int, ...], dtype, stack: ExitStack
+) -> Tuple[SharedArray, SharedMemory]:
+    dtype = np.dtype(dtype)
+    memory = SharedMemory(
+        create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1)
+    )
+    stack.callback(memory.unlink)
+    stack.callback(memory.close)
+
+    return SharedArray(memory.name, tuple(shape), dtype.str), memory
+
+
+def share(array: np.ndarray, stack: ExitStack) -> SharedArray:
+    shared, memory = allocate(array.shape, array.dtype, stack)
+    _view(memory, shared)[...] = array
+
+    return shared
+
+
+def attach(shared: SharedArray) -> np.ndarray:
+    if shared.name not in _attached:
+        memory = SharedMemory(name=shared.name)
+        _attached[shared.name] = memory, _view(memory, shared)
+    return _attached[shared.name][1]
+
+
+def _match_shard(
+    arrays: Dict[str, SharedArray],
+    shape: Tuple[int, int],
+    queries: sparse.csr_matrix,
+    start: int,
+    query_sizes: np.ndarray,
+    memory_budget: int,
+    top_k: Optional[int],
+):
+    matrix = NGramMatrix(
+        sparse.csr_matrix(
+            (
+                attach(arrays["data"]),
+                attach(arrays["indices"]),
+                attach(arrays["indptr"]),
+            ),
+            shape=shape,
+            copy=False,
+        ),
+        np.array([], dtype=np.int64),
+    )
+    result = matrix.match(
+        queries,
+        attach(arrays["weights"]),
+        query_sizes,
+        attach(arrays["sizes"]) if "sizes" in arrays else None,
+        memory_budget,
+        top_k,
+    )
+
+    if top_k is None:
+        attach(arrays["result"])[:, start : start + queries.shape[0]] = result
+        return None
+
+    rows, columns, values = result
+    return rows, columns + start, values
+
+
+def match_matrix(
+    matrix: NGramMatrix,
+    queries: sparse.csr_matrix,
+    weights: np.ndarray,
+    query_sizes: np.ndarray,
+    self_sizes: Optional[np.ndarray] = None,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    top_k: Optional[int] = None,
+    workers: Optional[int] = None,
+):
+    if workers is None or workers <= 1 or queries.shape[0] <= 1:
+        return matrix.match(
+            queries, weights, query_sizes, self_sizes, memory_budget, top_k
+        )
+
+    n_shards = min(workers * SHARDS_PER_WORKER, queries.shape[0])
+    bounds = np.linspace(0, queries.shape[0], n_shards + 1).astype(int)
+    shape = (len(matrix), queries.shape[0])
+
+    with ExitStack() as stack:
+        arrays = {
+            "data": share(matrix.matrix.data, stack),
+            "indices": share(matrix.matrix.indices, stack),
+            "indptr": share(matrix.matrix.indptr, stack),
+            "weights": share(weights, stack),
+        }
+        if self_sizes is not None:
+            arrays["sizes"] = share(self_sizes, stack)
+        if top_k is None:
+            arrays["result"], result = allocate(shape, np.float32, stack)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = list(
+                executor.map(
+                    _match_shard,
+                    *zip(
+                        *(
+                            (
+                                arrays,
+                                matrix.shape,
+                                queries[start:stop],
+                                start,
+                                query_sizes[start:stop],
+                                memory_budget // workers,
+                                top_k,
+                            )
+                            for start, stop in zip(bounds[:-1], bounds[1:])
+                        )
+                    ),
+                )
+            )
+
+        if top_k is None:
+            return _view(result, arrays["result"]).copy()
+
+    rows, columns, values = map(np.concatenate, zip(*shards))
+    order = np.lexsort((-values, columns))
+    return rows[order], columns[order], values[order]
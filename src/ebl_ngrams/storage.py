@@ -0,0 +1,145 @@
+import json
+import os
+from pathlib import Path
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Union,
+)
+
+import numpy as np
+
+FORMAT_VERSION = 3
+METADATA_FILE = "metadata.json"
+RECORDS = "records"
+
+PathLike = Union[str, Path]
+
+
+def replace_file(target: Path, write: Callable[[IO[bytes]], None]) -> None:
+    temporary = target.with_name(f"{target.name}.tmp")
+    with open(temporary, "wb") as file:
+        write(file)
+    os.replace(temporary, target)
+
+
+def save_json(path: Path, name: str, data) -> None:
+    replace_file(
+        path / name,
+        lambda file: file.write(json.dumps(data, ensure_ascii=False).encode("utf-8")),
+    )
+
+
+def load_json(path: Path, name: str):
+    with open(path / name, encoding="utf-8") as jf:
+        return json.load(jf)
+
+
+class Records(Sequence):
+    def __init__(self, path: PathLike, starts: np.ndarray, stops: np.ndarray):
+        self.path = Path(path)
+        self.starts = starts
+        self.stops = stops
+        self._buffer: Optional[np.ndarray] = None
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path, "starts": self.starts, "stops": self.stops}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def _data(self) -> np.ndarray:
+        if self._buffer is None:
+            self._buffer = (
+                np.memmap(self.path, dtype=np.uint8, mode="r")
+                if self.path.stat().st_size
+                else np.array([], dtype=np.uint8)
+            )
+        return self._buffer
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            position = range(len(self))[key]
+            return json.loads(
+                self._data()[self.starts[position] : self.stops[position]].tobytes()
+            )
+        positions = np.arange(len(self))[key]
+        return Records(self.path, self.starts[positions], self.stops[positions])
+
+    def __iter__(self) -> Iterator[dict]:
+        data = self._data()
+        for start, stop in zip(self.starts.tolist(), self.stops.tolist()):
+            yield json.loads(data[start:stop].tobytes())
+
+
+def save_records(path: Path, records: Iterable[dict], name=RECORDS) -> np.ndarray:
+    offsets = [0]
+
+    def write(records_file: IO[bytes]) -> None:
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+            records_file.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+    replace_file(path / f"{name}.jsonl", write)
+    return np.array(offsets, dtype=np.int64)
+
+
+def load_records(path: PathLike, name=RECORDS) -> Records:
+    path = Path(path)
+    offsets = np.load(path / f"{name}_offsets.npy")
+    return Records(path / f"{name}.jsonl", offsets[:-1], offsets[1:] - 1)
+
+
+def save(
+    path: PathLike,
+    metadata: dict,
+    arrays: Dict[str, np.ndarray],
+    tables: Dict[str, list],
+    records: Dict[str, Iterable[dict]],
+) -> None:
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    arrays = {
+        **arrays,
+        **{
+            f"{name}_offsets": save_records(path, entries, name)
+            for name, entries in records.items()
+        },
+    }
+    for name, array in arrays.items():
+        replace_file(
+            path / f"{name}.npy",
+            lambda file, array=array: np.save(file, np.ascontiguousarray(array)),
+        )
+    for name, table in tables.items():
+        save_json(path, f"{name}.json", table)
+
+    save_json(path, METADATA_FILE, {**metadata, "format_version": FORMAT_VERSION})
+
+
+def load_metadata(path: PathLike) -> dict:
+    metadata = load_json(Path(path), METADATA_FILE)
+    if metadata.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported corpus format version {metadata.get('format_version')}, "
+            f"expected {FORMAT_VERSION}."
+        )
+    return metadata
+
+
+def load_array(path: PathLike, name: str, mmap=True) -> np.ndarray:
+    return np.load(Path(path) / f"{name}.npy", mmap_mode="r" if mmap else None)
+
+
+def load_table(path: PathLike, name: str) -> list:
+    return load_json(Path(path), f"{name}.json")
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from ebl_ngrams import ChapterModel, FragmentCorpus, FragmentModel
+from ebl_ngrams.api_client import ApiClient, iter_json_array
+from ebl_ngrams.http_cache import ResponseCache
+from tests.test_support import sign_factory
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+FRAGMENTS = [{"_id": f"Stub.{i}", "signs": sign_factory(20, seed=i)} for i in range(50)]
+
+CHAPTER = {
+    "signs": ["A B C\nD E F", "A B X\nG H"],
+    "manuscripts": [
+        {
+            "provenance": "Nineveh",
+            "period": "Neo-Assyrian",
+            "type": "Library",
+            "siglumDisambiguator": str(i),
+            "colophon": {"numberOfLines": 0},
+            "unplacedLines": {"numberOfLines": 0},
+        }
+        for i in range(2)
+    ],
+    "textId": {"genre": "L", "category": 1, "index": 4},
+    "stage": "Standard Babylonian",
+    "name": "I",
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    routes: dict = {}
+    failures: dict = {}
+    delays: dict = {}
+    validators: tuple = ()
+    requests: list = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        time.sleep(self.delays.get(self.path, 0))
+
+        if self.failures.get(self.path, 0) > 0:
+            self.failures[self.path] -= 1
+            self.send_response(503)
+            self.end_headers()
+        elif self.path in self.routes:
+            body = json.dumps(self.routes[self.path]).encode()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.validators and (
+                self.headers.get("If-None-Match") == etag
+                or self.headers.get("If-Modified-Since") == LAST_MODIFIED
+            ):
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            if "etag" in self.validators:
+                self.send_header("ETag", etag)
+            if "last_modified" in self.validators:
+                self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except ConnectionError:
+                pass
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.routes = {
+        "/api/fragments/all-signs": FRAGMENTS,
+        **{f"/api/fragments/{entry['_id']}": entry for entry in FRAGMENTS},
+        "/api/texts/L/1/4/chapters/SB/I/signs": CHAPTER,
+        "/api/fragments/Broken.1": {"_id": "Broken.1"},
+    }
+    StubHandler.failures = {}
+    StubHandler.delays = {}
+    StubHandler.validators = ()
+    StubHandler.requests = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/api/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub_server):
+    with ApiClient(stub_server, timeout=5, backoff=0) as client:
+        yield client
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 10**6])
+def test_iter_json_array(chunk_size):
+    text = json.dumps([{"a": [1, 2, "]"]}, 12345, "x,y", [], None, 1.5]) + "\n"
+    chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    assert list(iter_json_array(chunks)) == json.loads(text)
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array([" [ ", " ] "])) == []
+
+
+@pytest.mark.parametrize("text", ['{"a": 1}', "[1, 2", "[1 2]", "[1] [2]"])
+def test_iter_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text]))
+
+
+def test_get_json(client):
+    assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+
+
+def test_get_json_retries(client):
+    StubHandler.failures["/api/fragments/Stub.1"] = 2
+
+    assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+    assert StubHandler.requests.count("/api/fragments/Stub.1") == 3
+
+
+def test_get_json_gives_up(stub_server):
+    StubHandler.failures["/api/fragments/Stub.1"] = 5
+
+    with ApiClient(stub_server, retries=1, backoff=0) as client:
+        with pytest.raises(requests.HTTPError):
+            client.get_json("fragments/Stub.1")
+
+
+def test_get_json_not_found(client):
+    with pytest.raises(requests.HTTPError):
+        client.get_json("fragments/Missing")
+    assert len(StubHandler.requests) == 1
+
+
+def test_get_json_timeout(stub_server):
+    StubHandler.delays["/api/fragments/Stub.1"] = 0.5
+
+    with ApiClient(stub_server, timeout=0.1, retries=0) as client:
+        with pytest.raises(requests.RequestException):
+            client.get_json("fragments/Stub.1")
+
+
+def test_iter_json(client):
+    assert list(client.iter_json("fragments/all-signs")) == FRAGMENTS
+
+
+def test_get_many(client):
+    paths = [f"fragments/Stub.{i}" for i in reversed(range(20))]
+
+    assert client.get_many(paths, workers=4) == FRAGMENTS[:20][::-1]
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_corpus_load(client, workers):
+    corpus = FragmentCorpus.load(show_progress=False, workers=workers, client=client)
+
+    assert corpus.data == FRAGMENTS
+    assert corpus.documents.index.to_list() == [entry["_id"] for entry in FRAGMENTS]
+
+
+def test_corpus_load_transform(client):
+    corpus = FragmentCorpus.load(
+        show_progress=False, transform=lambda data: data[:10], client=client
+    )
+
+    assert corpus.data == FRAGMENTS[:10]
+
+
+def test_fragment_load(client):
+    fragment = FragmentModel.load("Stub.3", client=client)
+
+    assert fragment.signs == FRAGMENTS[3]["signs"]
+
+
+def cached_client(stub_server, path, ttl):
+    return ApiClient(stub_server, backoff=0, cache=ResponseCache(path, ttl))
+
+
+def test_cache_hit(stub_server, tmp_path):
+    with cached_client(stub_server, tmp_path, ttl=60) as client:
+        assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+        assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+
+        assert StubHandler.requests == ["/api/fragments/Stub.1"]
+        assert client.cache.stats.as_dict() == {
+            "hits": 1,
+            "revalidated": 0,
+            "misses": 1,
+        }
+
+
+@pytest.mark.parametrize(
+    "validators", [("etag",), ("last_modified",), ("etag", "last_modified")]
+)
+def test_cache_revalidate(stub_server, tmp_path, validators):
+    StubHandler.validators = validators
+
+    with cached_client(stub_server, tmp_path, ttl=0) as client:
+        assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+        assert client.get_json("fragments/Stub.1") == FRAGMENTS[1]
+
+        assert len(StubHandler.requests) == 2
+        assert client.cache.stats.as_dict() == {
+            "hits": 0,
+            "revalidated": 1,
+            "misses": 1,
+        }
+
+
+def test_cache_changed(stub_server, tmp_path):
+    StubHandler.validators = ("etag",)
+
+    with cached_client(stub_server, tmp_path, ttl=0) as client:
+        client.get_json("fragments/Stub.1")
+        StubHandler.routes["/api/fragments/Stub.1"] = FRAGMENTS[2]
+
+        assert client.get_json("fragments/Stub.1") == FRAGMENTS[2]
+        assert client.cache.stats.misses == 2
+
+
+def test_cache_without_validators(stub_server, tmp_path):
+    with cached_client(stub_server, tmp_path, ttl=0) as client:
+        client.get_json("fragments/Stub.1")
+        client.get_json("fragments/Stub.1")
+
+        assert client.cache.stats.misses == 2
+
+
+def test_cache_is_persistent(stub_server, tmp_path):
+    with cached_client(stub_server, tmp_path, ttl=60) as client:
+        first = FragmentCorpus.load(show_progress=False, client=client)
+    with cached_client(stub_server, tmp_path, ttl=60) as client:
+        second = FragmentCorpus.load(show_progress=False, client=client)
+
+        assert client.cache.stats.hits == 1
+    assert StubHandler.requests == ["/api/fragments/all-signs"]
+    assert second.data == first.data == FRAGMENTS
+
+
+def test_cache_ignores_incomplete_downloads(stub_server, tmp_path):
+    with cached_client(stub_server, tmp_path, ttl=60) as client:
+        next(client.iter_json("fragments/all-signs"))
+
+        assert client.cache.entry(client.url("fragments/all-signs")) is None
+        assert list(tmp_path.iterdir()) == []
+
+
+def test_get_many_return_errors(client):
+    result = client.get_many(
+        ["fragments/Stub.1", "fragments/Missing", "fragments/Stub.2"],
+        return_errors=True,
+    )
+
+    assert result[0] == FRAGMENTS[1]
+    assert isinstance(result[1], requests.HTTPError)
+    assert result[2] == FRAGMENTS[2]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_fragment_load_many(client, workers):
+    ids = ["Stub.7", "Missing", "Stub.2", "Broken.1", "Stub.7", "Stub.0"]
+    documents, errors = FragmentModel.load_many(ids, client=client, workers=workers)
+
+    assert [document.id_ for document in documents] == [
+        "Stub.7",
+        "Stub.2",
+        "Stub.7",
+        "Stub.0",
+    ]
+    assert [document.signs for document in documents] == [
+        FRAGMENTS[i]["signs"] for i in [7, 2, 7, 0]
+    ]
+    assert list(errors) == ["Missing", "Broken.1"]
+    assert isinstance(errors["Missing"], requests.HTTPError)
+    assert isinstance(errors["Broken.1"], KeyError)
+
+
+def test_fragment_load_many_match(client):
+    corpus = FragmentCorpus(FRAGMENTS, show_progress=False)
+    documents, errors = FragmentModel.load_many(
+        ["Stub.3", "Stub.4"], (2, 3), client=client
+    )
+    result = corpus.match(documents)
+
+    assert errors == {}
+    assert result.columns.to_list() == ["Stub.3", "Stub.4"]
+    assert result.loc["Stub.3", "Stub.3"] == pytest.approx(1.0)
+
+
+def test_chapter_load_many(client):
+    documents, errors = ChapterModel.load_many(
+        ["https://www.ebl.lmu.de/corpus/L/1/4/SB/I", "/L/1/4/SB/II"], client=client
+    )
+
+    assert [document.id_ for document in documents] == ["/L/1/4/SB/I"]
+    assert documents[0].ngrams == ChapterModel(CHAPTER).ngrams
+    assert list(errors) == ["/L/1/4/SB/II"]
@@ -1,8 +1,30 @@
+import json
+import pickle
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 import numpy as np
-from ebl_ngrams import DEFAULT_N_VALUES, ChapterCorpus, FragmentCorpus, ChapterModel
+import pandas as pd
+from ebl_ngrams import (
+    DEFAULT_N_VALUES,
+    ChapterCorpus,
+    FragmentCorpus,
+    ChapterModel,
+    FragmentModel,
+)
 
-from tests.test_support import N_VALUES, create_multiline_ngrams
+from ebl_ngrams.base_corpus import DEFAULT_VIEWS, ENGINES, BaseCorpus
+from ebl_ngrams.enums.provenance import Provenance
+from ebl_ngrams.enums.stage import Stage
+from ebl_ngrams.lazy_documents import LazyDocuments
+from ebl_ngrams.storage import Records
+from tests.test_support import (
+    N_VALUES,
+    create_multiline_ngrams,
+    run_in_new_process,
+    sign_factory,
+)
 
 
 @pytest.fixture
@@ -113,3 +135,970 @@ def test_match_document(other_chapter, n_values):
     assert MOCK_CHAPTER_CORPUS.match(
         other_chapter, *n_values
     ).to_list() == pytest.approx(sorted(expected.to_list(), reverse=True))
+
+
+@pytest.mark.parametrize("n_values", N_VALUES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+@pytest.mark.parametrize("other_chapter", [*MOCK_CHAPTER_CORPUS.documents])
+def test_match_document_sparse(other_chapter, n_values, length_weighting):
+    expected = MOCK_CHAPTER_CORPUS.match(
+        other_chapter, *n_values, length_weighting=length_weighting
+    )
+    result = MOCK_CHAPTER_CORPUS.match(
+        other_chapter, *n_values, length_weighting=length_weighting, engine="sparse"
+    )
+    assert result.name == expected.name
+    assert result.sort_index().to_list() == pytest.approx(
+        expected.sort_index().to_list()
+    )
+
+
+def test_match_unknown_engine(mock_chapter):
+    with pytest.raises(ValueError):
+        MOCK_CHAPTER_CORPUS.match(mock_chapter, engine="unknown")
+
+
+@pytest.mark.parametrize("length_weighting", [False, True])
+def test_match_unseen_ngrams_sparse(mock_fragment_corpus, length_weighting):
+    fragment = FragmentModel("Mock.Unseen", "A B C\nY Z H I", DEFAULT_N_VALUES)
+    expected = mock_fragment_corpus.match(fragment, length_weighting=length_weighting)
+    result = mock_fragment_corpus.match(
+        fragment, length_weighting=length_weighting, engine="sparse"
+    )
+    assert result.to_list() == pytest.approx(expected.to_list())
+
+
+@pytest.mark.parametrize("n_values", N_VALUES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+@pytest.mark.parametrize("memory_budget", [1, 2**20])
+def test_match_corpus_sparse(
+    mock_fragment_corpus, n_values, length_weighting, memory_budget
+):
+    expected = MOCK_CHAPTER_CORPUS.match(
+        mock_fragment_corpus, *n_values, length_weighting=length_weighting
+    )
+    result = MOCK_CHAPTER_CORPUS.match(
+        mock_fragment_corpus,
+        *n_values,
+        length_weighting=length_weighting,
+        engine="sparse",
+        memory_budget=memory_budget,
+    )
+    assert result.dtypes.eq(np.float32).all()
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result.to_numpy(), expected.fillna(0.0).to_numpy())
+
+
+def test_match_corpus_sparse_top_k(mock_fragment_corpus):
+    scores = MOCK_CHAPTER_CORPUS.match(mock_fragment_corpus, engine="sparse")
+    result = MOCK_CHAPTER_CORPUS.match(mock_fragment_corpus, engine="sparse", top_k=2)
+
+    assert len(result) == 2 * len(mock_fragment_corpus)
+    for position in range(len(mock_fragment_corpus)):
+        expected = sorted(scores.iloc[:, position], reverse=True)[:2]
+        assert result.iloc[2 * position : 2 * position + 2].to_list() == (
+            pytest.approx(expected)
+        )
+
+
+@pytest.mark.parametrize("n_values", N_VALUES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+@pytest.mark.parametrize("other_chapter", [*MOCK_CHAPTER_CORPUS.documents])
+def test_match_document_index(other_chapter, n_values, length_weighting):
+    expected = MOCK_CHAPTER_CORPUS.match(
+        other_chapter, *n_values, length_weighting=length_weighting
+    )
+    result = MOCK_CHAPTER_CORPUS.match(
+        other_chapter, *n_values, length_weighting=length_weighting, engine="index"
+    )
+    assert result.to_list() == pytest.approx(expected[expected > 0].to_list())
+
+
+def test_inverted_index_postings(mock_fragment_corpus):
+    index = mock_fragment_corpus.inverted_index
+    encoder = mock_fragment_corpus.encoder
+
+    assert len(index) == len(encoder)
+    assert index.get_postings(encoder.encode(("G",))).tolist() == [0, 1]
+    assert index.get_postings(encoder.encode(("K", "L", "M"))).tolist() == [1]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_match_long_ngrams(tmp_path, engine):
+    corpus = FragmentCorpus(
+        [
+            {"_id": "Long.1", "signs": "A B C D E F G H I\nJ K"},
+            {"_id": "Long.2", "signs": "A B C D E F G H\nJ K"},
+            {"_id": "Long.3", "signs": "B C D E F G H I"},
+        ],
+        (2, 8),
+    )
+    fragment = FragmentModel("Query", "A B C D E F G H I J", (2, 8))
+    corpus.save(tmp_path / "fragments")
+    opened = FragmentCorpus.open(tmp_path / "fragments")
+
+    expected = corpus.match(fragment, 8)
+    assert expected["Long.3"] == 1.0
+    assert corpus.match(fragment, 8, engine=engine).to_dict() == pytest.approx(
+        expected[expected > 0].to_dict()
+    )
+    assert opened.match(fragment, 2, 8, engine=engine).to_dict() == pytest.approx(
+        corpus.match(fragment, 2, 8).to_dict()
+    )
+
+
+@pytest.fixture
+def random_fragment_corpus():
+    return FragmentCorpus(
+        [
+            {"_id": f"Random.{i}", "signs": sign_factory(size, seed=i)}
+            for i, size in enumerate(np.random.RandomState(0).randint(1, 60, 200))
+        ],
+        DEFAULT_N_VALUES,
+    )
+
+
+@pytest.mark.parametrize("k", [1, 5, 50, 500])
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+def test_match_top_k(random_fragment_corpus, k, engine, length_weighting):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    expected = random_fragment_corpus.match(query, length_weighting=length_weighting)
+    result = random_fragment_corpus.match(
+        query, length_weighting=length_weighting, engine=engine, top_k=k
+    )
+
+    assert len(result) <= k
+    assert result.to_list() == pytest.approx(expected.to_list()[: len(result)])
+    if engine != "index":
+        assert len(result) == min(k, len(expected))
+
+
+def test_match_top_k_method(random_fragment_corpus):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    expected = random_fragment_corpus.match(query).head(10)
+    result = random_fragment_corpus.match_top_k(query, 10)
+
+    assert result.to_list() == pytest.approx(expected.to_list())
+
+
+@pytest.mark.parametrize("top_k", [0, -1])
+def test_match_top_k_invalid(random_fragment_corpus, top_k):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    with pytest.raises(ValueError):
+        random_fragment_corpus.match(query, top_k=top_k)
+
+
+def match_peak(matrix, queries, weights, memory_budget, top_k=None):
+    query_sizes = np.asarray(queries @ weights)
+    sizes = matrix.sizes(weights)
+
+    tracemalloc.start()
+    try:
+        result = matrix.match(
+            queries, weights, query_sizes, sizes, memory_budget, top_k
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak - (result.nbytes if top_k is None else 0)
+
+
+@pytest.mark.parametrize("top_k", [None, 3])
+def test_match_memory_budget(random_fragment_corpus, top_k):
+    memory_budget = 2**20
+    matrix = random_fragment_corpus.matrix
+    weights = matrix.column_weights(DEFAULT_N_VALUES)
+    queries = random_fragment_corpus._encode_queries(
+        pd.concat([random_fragment_corpus.get_keys_by_document()] * 5)
+    )
+    expected, overhead = match_peak(matrix, queries, weights, 1)
+    result, peak = match_peak(matrix, queries, weights, memory_budget, top_k)
+
+    assert len(matrix.block_bounds(queries, memory_budget, top_k)) > 2
+    assert peak <= memory_budget + overhead
+    if top_k is None:
+        np.testing.assert_array_equal(result, expected)
+
+
+def tf_idf_reference(corpus, document, n_values, length_weighting, normalize):
+    ngrams_by_document = corpus.get_ngrams_by_document(*n_values)
+    N = len(corpus) + 1
+
+    def weight(ngram):
+        frequency = sum(ngram in ngrams for ngrams in ngrams_by_document)
+        idf = np.log(N / (frequency + 1)) + 1
+        return idf * len(ngram) ** 2 if length_weighting else idf
+
+    query = document.get_ngrams(*n_values)
+    scores = ngrams_by_document.map(
+        lambda ngrams: sum(weight(ngram) for ngram in ngrams & query)
+    )
+    if normalize:
+        scores /= sum(weight(ngram) for ngram in query)
+    return scores
+
+
+@pytest.mark.parametrize("n_values", N_VALUES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+@pytest.mark.parametrize("normalize", [False, True])
+def test_match_tf_idf_document(
+    random_fragment_corpus, n_values, length_weighting, normalize
+):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    expected = tf_idf_reference(
+        random_fragment_corpus, query, n_values, length_weighting, normalize
+    )
+    result = random_fragment_corpus.match_tf_idf(
+        query, *n_values, length_weighting=length_weighting, normalize=normalize
+    )
+
+    assert result.name == query.id_
+    assert result.sort_index().to_list() == pytest.approx(
+        expected.sort_index().to_list()
+    )
+    assert result.to_list() == sorted(result.to_list(), reverse=True)
+
+
+@pytest.mark.parametrize("k", [1, 10, 500])
+def test_match_tf_idf_top_k(random_fragment_corpus, k):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    expected = random_fragment_corpus.match_tf_idf(query, 2, 3)
+    result = random_fragment_corpus.match_tf_idf(query, 2, 3, top_k=k)
+
+    assert result.to_list() == pytest.approx(expected.to_list()[: len(result)])
+
+
+def test_match_tf_idf_keeps_encoder(random_fragment_corpus):
+    size = len(random_fragment_corpus.encoder)
+    random_fragment_corpus.match_tf_idf(FragmentModel("Query", "NEW SIGNS HERE"))
+
+    assert len(random_fragment_corpus.encoder) == size
+
+
+@pytest.mark.parametrize("length_weighting", [False, True])
+@pytest.mark.parametrize("normalize", [False, True])
+@pytest.mark.parametrize("memory_budget", [1, 2**20])
+def test_match_tf_idf_corpus(
+    random_fragment_corpus,
+    mock_fragment_corpus,
+    length_weighting,
+    normalize,
+    memory_budget,
+):
+    result = random_fragment_corpus.match_tf_idf(
+        mock_fragment_corpus,
+        2,
+        3,
+        length_weighting=length_weighting,
+        normalize=normalize,
+        memory_budget=memory_budget,
+    )
+
+    assert result.shape == (len(mock_fragment_corpus), len(random_fragment_corpus))
+    for position, document in enumerate(mock_fragment_corpus):
+        expected = random_fragment_corpus.match_tf_idf(
+            document, 2, 3, length_weighting=length_weighting, normalize=normalize
+        )
+        np.testing.assert_allclose(
+            result.iloc[position].to_numpy(),
+            expected.reindex(random_fragment_corpus.documents.index).to_numpy(),
+            rtol=1e-5,
+        )
+
+
+def test_match_tf_idf_corpus_top_k(random_fragment_corpus, mock_fragment_corpus):
+    scores = random_fragment_corpus.match_tf_idf(mock_fragment_corpus)
+    result = random_fragment_corpus.match_tf_idf(mock_fragment_corpus, top_k=3)
+
+    for position, id_ in enumerate(scores.index):
+        expected = sorted(scores.iloc[position], reverse=True)[:3]
+        assert result.iloc[3 * position : 3 * position + 3].to_list() == (
+            pytest.approx(expected)
+        )
+
+
+@pytest.mark.parametrize("top_k", [None, 3])
+def test_match_corpus_workers(random_fragment_corpus, top_k):
+    expected = random_fragment_corpus.match(
+        random_fragment_corpus, engine="sparse", top_k=top_k
+    )
+    result = random_fragment_corpus.match(
+        random_fragment_corpus, engine="sparse", top_k=top_k, workers=2
+    )
+    assert result.equals(expected)
+    assert random_fragment_corpus.match(
+        random_fragment_corpus, top_k=top_k, workers=2
+    ).equals(expected)
+
+
+@pytest.mark.parametrize("as_list", [False, True])
+def test_match_corpus_index_engine(
+    random_fragment_corpus, mock_fragment_corpus, as_list
+):
+    other = list(mock_fragment_corpus.documents) if as_list else mock_fragment_corpus
+    with pytest.raises(ValueError, match="engine='sparse'"):
+        random_fragment_corpus.match(other, engine="index")
+
+
+def test_match_corpus_workers_requires_sparse(random_fragment_corpus):
+    with pytest.raises(ValueError, match="engine='sparse'"):
+        random_fragment_corpus.match(random_fragment_corpus, engine="sets", workers=2)
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+def test_match_tf_idf_documents_workers(random_fragment_corpus, normalize):
+    documents = list(random_fragment_corpus.documents[:20])
+    expected = random_fragment_corpus.match_tf_idf(documents, normalize=normalize)
+    result = random_fragment_corpus.match_tf_idf(
+        documents, normalize=normalize, workers=2
+    )
+    assert result.index.to_list() == [document.id_ for document in documents]
+    assert result.equals(expected)
+
+
+def test_match_documents(random_fragment_corpus, mock_fragment_corpus):
+    expected = random_fragment_corpus.match(mock_fragment_corpus, engine="sparse")
+    result = random_fragment_corpus.match(
+        list(mock_fragment_corpus.documents), engine="sparse"
+    )
+    assert result.equals(expected)
+
+
+def test_load_workers(mock_fragments_data):
+    expected = FragmentCorpus(mock_fragments_data)
+    corpus = FragmentCorpus(mock_fragments_data, workers=2)
+
+    assert corpus.documents.index.equals(expected.documents.index)
+    assert corpus.ngrams_by_document.to_list() == expected.ngrams_by_document.to_list()
+
+
+def test_load_chapters_workers():
+    corpus = ChapterCorpus(MOCK_CHAPTER_DATA, workers=2)
+
+    assert corpus.ngrams_by_document.to_list() == (
+        MOCK_CHAPTER_CORPUS.ngrams_by_document.to_list()
+    )
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_open(tmp_path, random_fragment_corpus, mmap):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    corpus = BaseCorpus.open(tmp_path / "fragments", mmap=mmap)
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+
+    assert isinstance(corpus, FragmentCorpus)
+    assert corpus.retrieved_on == random_fragment_corpus.retrieved_on
+    assert corpus.n_values == tuple(random_fragment_corpus.n_values)
+    assert corpus.documents.index.equals(random_fragment_corpus.documents.index)
+    assert corpus.ngrams_by_document.equals(random_fragment_corpus.ngrams_by_document)
+    for engine in ENGINES:
+        assert corpus.match(query, engine=engine).equals(
+            random_fragment_corpus.match(query, engine=engine)
+        )
+    assert corpus.match_tf_idf(query).equals(random_fragment_corpus.match_tf_idf(query))
+
+
+def test_save_open_chapters(tmp_path, mock_chapter):
+    MOCK_CHAPTER_CORPUS.save(tmp_path / "chapters")
+    corpus = ChapterCorpus.open(tmp_path / "chapters")
+
+    assert isinstance(corpus, ChapterCorpus)
+    assert not (tmp_path / "chapters" / "data.npy").exists()
+    assert corpus.ngrams_by_document.equals(MOCK_CHAPTER_CORPUS.ngrams_by_document)
+    for opened, original in zip(corpus.documents, MOCK_CHAPTER_CORPUS.documents):
+        assert np.array_equal(opened.ngram_keys, original.ngram_keys)
+        assert opened.keys_by_manuscript.keys() == original.keys_by_manuscript.keys()
+        for siglum, keys in original.keys_by_manuscript.items():
+            assert np.array_equal(opened.keys_by_manuscript[siglum], keys)
+    assert corpus.match(mock_chapter, engine="sparse").equals(
+        MOCK_CHAPTER_CORPUS.match(mock_chapter, engine="sparse")
+    )
+
+
+def test_open_wrong_class(tmp_path, mock_fragment_corpus):
+    mock_fragment_corpus.save(tmp_path / "fragments")
+    with pytest.raises(ValueError):
+        ChapterCorpus.open(tmp_path / "fragments")
+
+
+def test_open_lazy(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    corpus = FragmentCorpus.open(tmp_path / "fragments", lazy=True)
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+
+    assert isinstance(corpus.documents, LazyDocuments)
+    assert isinstance(corpus.documents.records, Records)
+    assert len(corpus) == len(random_fragment_corpus)
+    assert corpus.documents["Random.3"].ngrams == (
+        random_fragment_corpus.documents["Random.3"].ngrams
+    )
+    for engine in ENGINES:
+        assert corpus.match(query, engine=engine).equals(
+            random_fragment_corpus.match(query, engine=engine)
+        )
+    assert corpus.match_tf_idf(query).equals(random_fragment_corpus.match_tf_idf(query))
+    assert corpus.match(query, include_overlaps=True).equals(
+        random_fragment_corpus.match(query, include_overlaps=True)
+    )
+
+
+def test_save_lazy_in_place(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    FragmentCorpus.open(tmp_path / "fragments", lazy=True).save(tmp_path / "fragments")
+    corpus = FragmentCorpus.open(tmp_path / "fragments")
+
+    assert corpus.documents.index.equals(random_fragment_corpus.documents.index)
+    assert corpus.documents.iloc[-1].signs == (
+        random_fragment_corpus.documents.iloc[-1].signs
+    )
+
+
+def test_lazy_documents_cache(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    documents = FragmentCorpus.open(tmp_path / "fragments", lazy=True).documents
+    documents._cache_size = 2
+
+    assert documents["Random.1"] is documents["Random.1"]
+    documents.iloc[5], documents.iloc[6]
+    assert len(documents._cache) == 2
+    assert documents.iloc[1].id_ == "Random.1"
+
+
+def test_lazy_documents_select(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    documents = FragmentCorpus.open(tmp_path / "fragments", lazy=True).documents
+
+    assert documents[["Random.2", "Random.1"]].index.to_list() == [
+        "Random.2",
+        "Random.1",
+    ]
+    with pytest.raises(KeyError, match="Missing"):
+        documents[["Random.1", "Missing"]]
+
+
+def test_lazy_match_without_documents(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    corpus = FragmentCorpus.open(tmp_path / "fragments", lazy=True)
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+
+    assert corpus.match(query).equals(random_fragment_corpus.match(query))
+    assert corpus.match(query, include_overlaps=True).equals(
+        random_fragment_corpus.match(query, include_overlaps=True)
+    )
+    assert corpus.get_ngrams_by_document(1).equals(
+        random_fragment_corpus.get_ngrams_by_document(1)
+    )
+    assert corpus.ngrams == random_fragment_corpus.ngrams
+    assert not corpus.documents._cache
+
+
+def test_filter_lazy(tmp_path, random_fragment_corpus):
+    random_fragment_corpus.save(tmp_path / "fragments")
+    corpus = FragmentCorpus.open(tmp_path / "fragments", lazy=True)
+
+    def condition(fragment):
+        return fragment.id_.endswith("1")
+
+    expected = random_fragment_corpus.filter(condition)
+    result = corpus.filter(condition)
+
+    assert result.documents.index.equals(expected.documents.index)
+    assert result.get_ngrams() == expected.get_ngrams()
+
+
+def random_fragments(start, stop, offset=0):
+    return [
+        {"_id": f"Random.{i}", "signs": sign_factory(40, seed=i + offset)}
+        for i in range(start, stop)
+    ]
+
+
+def assert_same_corpus(corpus, expected):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+
+    assert corpus.documents.index.to_list() == expected.documents.index.to_list()
+    assert corpus.ngrams == expected.ngrams
+    assert corpus.match(query, engine="sets").to_dict() == pytest.approx(
+        expected.match(query, engine="sets").to_dict()
+    )
+    for engine in ["sparse", "index"]:
+        assert corpus.match(query, engine=engine, top_k=10).to_list() == (
+            pytest.approx(expected.match(query, engine=engine, top_k=10).to_list())
+        )
+    assert corpus.match_tf_idf(query, normalize=True).to_dict() == pytest.approx(
+        expected.match_tf_idf(query, normalize=True).to_dict()
+    )
+
+
+@pytest.mark.parametrize("built", [False, True])
+def test_add_documents(built):
+    corpus = FragmentCorpus(random_fragments(0, 50))
+    if built:
+        corpus.inverted_index, corpus.idf_table
+
+    corpus.add_documents(random_fragments(50, 60))
+
+    assert_same_corpus(corpus, FragmentCorpus(random_fragments(0, 60)))
+
+
+@pytest.mark.parametrize("built", [False, True])
+def test_remove_documents(built):
+    corpus = FragmentCorpus(random_fragments(0, 60))
+    if built:
+        corpus.inverted_index, corpus.idf_table
+
+    corpus.remove_documents([f"Random.{i}" for i in range(50, 60)])
+
+    assert_same_corpus(corpus, FragmentCorpus(random_fragments(0, 50)))
+
+
+def test_update_documents():
+    corpus = FragmentCorpus(random_fragments(0, 60))
+    corpus.inverted_index, corpus.idf_table
+
+    corpus.update_documents(random_fragments(50, 60, offset=100))
+
+    assert_same_corpus(
+        corpus,
+        FragmentCorpus(random_fragments(0, 50) + random_fragments(50, 60, offset=100)),
+    )
+
+
+def test_add_documents_lazy(tmp_path):
+    FragmentCorpus(random_fragments(0, 50)).save(tmp_path / "fragments")
+    corpus = FragmentCorpus.open(tmp_path / "fragments", lazy=True)
+    records = corpus.documents.records
+
+    corpus.add_documents(random_fragments(50, 60))
+    corpus.add_documents(random_fragments(60, 65))
+
+    assert isinstance(corpus.documents, LazyDocuments)
+    assert corpus.documents.records.parts[0] is records
+    assert len(corpus.documents.records.parts) == 3
+    assert_same_corpus(corpus, FragmentCorpus(random_fragments(0, 65)))
+
+    corpus.remove_documents([f"Random.{i}" for i in range(45, 62)])
+    expected = FragmentCorpus([*random_fragments(0, 45), *random_fragments(62, 65)])
+    assert_same_corpus(corpus, expected)
+    assert corpus.documents[["Random.63", "Random.1"]].records[0]["_id"] == "Random.63"
+
+    corpus.save(tmp_path / "fragments")
+    assert_same_corpus(FragmentCorpus.open(tmp_path / "fragments"), expected)
+
+
+def test_add_and_remove_documents_errors(mock_fragment_corpus):
+    with pytest.raises(ValueError, match="already in corpus"):
+        mock_fragment_corpus.add_documents([{"_id": "Mock.1", "signs": "A B C"}])
+    with pytest.raises(ValueError, match="not in corpus"):
+        mock_fragment_corpus.remove_documents(["Missing.1"])
+
+
+def test_filter_shares_documents(random_fragment_corpus):
+    view = random_fragment_corpus.filter(lambda doc: doc.id_.endswith("1"))
+
+    assert view.encoder is random_fragment_corpus.encoder
+    assert view.documents["Random.1"] is random_fragment_corpus.documents["Random.1"]
+    assert view.documents.index.to_list() == [
+        id_ for id_ in random_fragment_corpus.documents.index if id_.endswith("1")
+    ]
+
+
+def test_views_are_memoized(random_fragment_corpus):
+    corpus = random_fragment_corpus
+    keys = corpus.get_keys_by_document(3, 2)
+
+    assert corpus.get_keys_by_document(2, 3) is keys
+    assert corpus.get_ngrams_by_document(2, 3) is corpus.get_ngrams_by_document(3, 2)
+    assert corpus.get_ngrams(2, 3) is corpus.get_ngrams(2, 3, 3)
+    assert corpus.get_ngrams_by_document(2, 3).to_dict() == {
+        document.id_: document.get_ngrams(2, 3) for document in corpus.documents
+    }
+    assert corpus.get_ngrams(2, 3) == corpus.ngrams & set.union(
+        *corpus.get_ngrams_by_document(2, 3)
+    )
+
+
+def test_views_are_bounded(random_fragment_corpus):
+    corpus = random_fragment_corpus
+    n_values = [(n,) for n in range(1, DEFAULT_VIEWS + 2)]
+    for n in n_values:
+        corpus.get_keys_by_document(*n)
+
+    assert len(corpus._views) == DEFAULT_VIEWS
+    assert ("keys_by_document", n_values[0]) not in corpus._views
+    assert ("keys_by_document", n_values[-1]) in corpus._views
+
+
+def test_views_are_reset(random_fragment_corpus):
+    corpus = random_fragment_corpus
+    corpus.get_keys_by_document(2, 3)
+    corpus.add_documents(random_fragments(200, 202))
+    view = corpus.select(np.arange(5))
+
+    assert corpus.get_keys_by_document(2, 3).index.to_list()[-2:] == [
+        "Random.200",
+        "Random.201",
+    ]
+    assert view.get_keys_by_document(2, 3).index.equals(view.documents.index)
+
+
+LOAD_CORPUS = """
+import json, pickle, sys
+from ebl_ngrams import DEFAULT_N_VALUES, FragmentModel
+from ebl_ngrams.ngram_keys import pack
+
+pack({tuple(f"ABZ{i}" for i in range(200, 0, -1))})
+with open(sys.argv[1], "rb") as pickled:
+    corpus = pickle.load(pickled)
+query = FragmentModel("Query", sys.argv[2], DEFAULT_N_VALUES)
+print(json.dumps([
+    sorted(map(list, corpus.get_ngrams(1))),
+    json.loads(corpus.match(query, engine="sparse").to_json()),
+    json.loads(corpus.match_tf_idf(query).to_json()),
+]))
+"""
+
+
+def test_pickle_in_new_process(tmp_path, random_fragment_corpus):
+    signs = sign_factory(30, seed=1000)
+    query = FragmentModel("Query", signs, DEFAULT_N_VALUES)
+    random_fragment_corpus.matrix, random_fragment_corpus.ngram_keys
+    (tmp_path / "corpus.pkl").write_bytes(pickle.dumps(random_fragment_corpus))
+
+    ngrams, scores, tf_idf_scores = json.loads(
+        run_in_new_process(LOAD_CORPUS, str(tmp_path / "corpus.pkl"), signs)
+    )
+
+    assert ngrams == sorted(map(list, random_fragment_corpus.get_ngrams(1)))
+    expected = random_fragment_corpus.match(query, engine="sparse")
+    assert scores == pytest.approx(json.loads(expected.to_json()))
+    expected = random_fragment_corpus.match_tf_idf(query)
+    assert tf_idf_scores == pytest.approx(json.loads(expected.to_json()))
+
+
+def test_frozen_corpus(random_fragment_corpus):
+    corpus = random_fragment_corpus.freeze()
+
+    assert corpus.frozen and corpus.encoder.frozen
+    with pytest.raises(ValueError, match="frozen"):
+        corpus.add_documents(random_fragments(200, 201))
+    with pytest.raises(ValueError, match="frozen"):
+        corpus.remove_documents(["Random.0"])
+    with pytest.raises(ValueError, match="frozen"):
+        corpus.update_documents([{"_id": "Random.0"}])
+    assert not corpus.rebuild_ngrams(2).frozen
+
+    loaded = pickle.loads(pickle.dumps(corpus))
+    assert loaded.frozen and loaded.encoder.frozen
+    assert len(loaded._views) == 0
+
+
+def test_frozen_corpus_matches_concurrently(random_fragment_corpus):
+    corpus = random_fragment_corpus.freeze()
+    queries = [
+        FragmentModel(f"Query.{i}", sign_factory(30, seed=1000 + i), DEFAULT_N_VALUES)
+        for i in range(16)
+    ]
+    encoder_size = len(corpus.encoder)
+
+    def match(query):
+        return [
+            *(corpus.match(query, engine=engine) for engine in ENGINES),
+            corpus.match_top_k(query, 5),
+            corpus.match_tf_idf(query, normalize=True),
+            corpus.get_ngrams_by_document(2, 3).map(len),
+        ]
+
+    expected = list(map(match, queries))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(match, queries * 4))
+
+    assert len(corpus.encoder) == encoder_size
+    for query_results, expected_results in zip(results, expected * 4):
+        for result, expected_result in zip(query_results, expected_results):
+            assert result.to_dict() == pytest.approx(expected_result.to_dict())
+
+
+def test_select_mask_and_positions(random_fragment_corpus):
+    mask = np.arange(len(random_fragment_corpus)) % 3 == 0
+    by_mask = random_fragment_corpus.select(mask)
+    by_positions = random_fragment_corpus.select(np.flatnonzero(mask))
+
+    assert by_mask.documents.index.equals(by_positions.documents.index)
+    assert (by_mask.matrix.matrix != by_positions.matrix.matrix).nnz == 0
+    with pytest.raises(ValueError):
+        random_fragment_corpus.select(mask[:-1])
+
+
+@pytest.mark.parametrize("engine", ["sets", "sparse", "index"])
+def test_view_match(random_fragment_corpus, engine):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    view = random_fragment_corpus.select(np.arange(0, 200, 2))
+    expected = random_fragment_corpus.match(query)
+
+    result = view.match(query, engine=engine)
+
+    assert result.reindex(view.documents.index, fill_value=0.0).to_dict() == (
+        pytest.approx(expected[view.documents.index].to_dict())
+    )
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+def test_view_match_tf_idf_uses_parent_statistics(random_fragment_corpus, normalize):
+    query = FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+    view = random_fragment_corpus.select(np.arange(0, 200, 2)).select(
+        np.arange(0, 100, 5)
+    )
+    expected = random_fragment_corpus.match_tf_idf(query, normalize=normalize)
+
+    assert view.documents.index.to_list() == [f"Random.{i}" for i in range(0, 200, 10)]
+    assert view.idf_table is random_fragment_corpus.idf_table
+    assert view.match_tf_idf(query, normalize=normalize).to_dict() == pytest.approx(
+        expected[view.documents.index].to_dict()
+    )
+
+
+def test_view_of_changed_corpus():
+    corpus = FragmentCorpus(random_fragments(0, 20))
+    view = corpus.select([0, 1, 2])
+
+    with pytest.raises(ValueError):
+        view.remove_documents(["Random.0"])
+
+    corpus.remove_documents(["Random.10"])
+
+    with pytest.raises(ValueError):
+        view.idf_table
+
+
+def test_rebuild_ngrams_keeps_original(random_fragment_corpus):
+    ngrams = random_fragment_corpus.documents["Random.1"].ngrams
+    rebuilt = random_fragment_corpus.rebuild_ngrams(2)
+
+    assert random_fragment_corpus.documents["Random.1"].ngrams == ngrams
+    assert rebuilt.documents["Random.1"].ngrams == {
+        ngram for ngram in ngrams if len(ngram) == 2
+    }
+    assert rebuilt.n_values == (2,)
+
+
+METADATA_CHAPTER_DATA = [
+    {
+        **MOCK_CHAPTER_DATA[0],
+        "manuscripts": [
+            mock_manuscript_factory(),
+            mock_manuscript_factory(provenance="Babylon", siglumDisambiguator="a"),
+            mock_manuscript_factory(type="School"),
+        ],
+    },
+    {**MOCK_CHAPTER_DATA[1], "textId": {"genre": "Mag", "category": 2, "index": 1}},
+    {
+        **MOCK_CHAPTER_DATA[2],
+        "textId": {"genre": "Mag", "category": 3, "index": 1},
+        "stage": "Standard Babylonian",
+    },
+]
+
+
+@pytest.fixture
+def metadata_chapter_corpus():
+    return ChapterCorpus(METADATA_CHAPTER_DATA)
+
+
+def test_metadata(metadata_chapter_corpus, mock_fragment_corpus):
+    metadata = metadata_chapter_corpus.metadata
+
+    assert len(metadata) == 6
+    assert metadata.index.name == "id"
+    assert metadata.loc[metadata.provenance == "Babylon", "siglum"].to_list() == [
+        "BabOBa"
+    ]
+    assert mock_fragment_corpus.metadata.prefix.to_list() == ["Mock"] * 3
+
+
+@pytest.mark.parametrize(
+    "criteria,expected",
+    [
+        ({"genre": "Mag"}, [1, 2]),
+        ({"genre": "Mag", "stage": Stage.STANDARD_BABYLONIAN}, [2]),
+        ({"category": [1, 3]}, [0, 2]),
+        ({"provenance": Provenance.BABYLON}, [0]),
+        ({"provenance": "Babylon", "type": "School"}, []),
+        ({"index": lambda index: index > 1}, [0]),
+    ],
+)
+def test_where(metadata_chapter_corpus, criteria, expected):
+    view = metadata_chapter_corpus.where(**criteria)
+
+    assert view.documents.index.equals(
+        metadata_chapter_corpus.documents.index[expected]
+    )
+
+
+def test_query(metadata_chapter_corpus, mock_fragment_corpus):
+    view = metadata_chapter_corpus.query("genre == 'L' and type == 'School'")
+
+    assert view.documents.index.equals(metadata_chapter_corpus.documents.index[[0]])
+    assert len(mock_fragment_corpus.query("prefix == 'Mock'")) == 3
+    assert len(mock_fragment_corpus.query("prefix == 'BM'")) == 0
+
+
+def test_where_view(metadata_chapter_corpus):
+    view = metadata_chapter_corpus.select([2, 0]).where(genre="Mag")
+
+    assert view.documents.index.equals(metadata_chapter_corpus.documents.index[[2]])
+    assert view.metadata.index.equals(metadata_chapter_corpus.documents.index[[2, 2]])
+
+
+def test_where_unknown_column(metadata_chapter_corpus):
+    with pytest.raises(ValueError):
+        metadata_chapter_corpus.where(museum="BM")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("length_weighting", [False, True])
+def test_match_manuscripts(metadata_chapter_corpus, engine, length_weighting):
+    query = FragmentModel("Query", "A B C D\nG H I J\nK L M", DEFAULT_N_VALUES)
+    weight = (lambda ngram: len(ngram) ** 2) if length_weighting else (lambda _: 1)
+
+    def size(ngrams):
+        return sum(map(weight, ngrams))
+
+    expected = {
+        (chapter.id_, siglum): (
+            size(ngrams & query.ngrams) / min(size(ngrams), size(query.ngrams))
+            if ngrams
+            else 0.0
+        )
+        for chapter in metadata_chapter_corpus.chapters
+        for siglum, ngrams in chapter.ngrams_by_manuscript.items()
+    }
+    result = metadata_chapter_corpus.match_manuscripts(
+        query, engine=engine, length_weighting=length_weighting
+    )
+
+    assert result.index.names == ["chapter", "siglum"]
+    assert result.to_dict() == pytest.approx(
+        {key: score for key, score in expected.items() if score or engine != "index"}
+    )
+    assert metadata_chapter_corpus.match_manuscripts(
+        query, engine=engine, top_k=2
+    ).index.to_list() == [
+        ("/L/1/2/OB/-", "BabOBa"),
+        ("/L/1/2/OB/-", "NinOB"),
+    ]
+
+
+def test_manuscripts_of_view(metadata_chapter_corpus):
+    manuscripts = metadata_chapter_corpus.where(genre="Mag").manuscripts
+
+    assert manuscripts.documents.index.to_list() == [
+        ("/Mag/2/1/OB/-", "NinOB"),
+        ("/Mag/3/1/SB/-", "NinOB"),
+    ]
+
+
+def test_frozen_chapter_corpus(metadata_chapter_corpus):
+    query = FragmentModel("Query", "A B C D\nG H I J\nK L M", DEFAULT_N_VALUES)
+    expected = metadata_chapter_corpus.match_manuscripts(query)
+    corpus = metadata_chapter_corpus.freeze()
+
+    assert corpus.manuscripts.frozen
+    assert corpus.match_manuscripts(query).equals(expected)
+    with pytest.raises(ValueError, match="frozen"):
+        corpus.manuscripts.remove_documents([corpus.manuscripts.documents.index[0]])
+
+
+def test_save_open_manuscripts(tmp_path, metadata_chapter_corpus):
+    manuscripts = metadata_chapter_corpus.manuscripts
+    manuscripts.save(tmp_path / "manuscripts")
+    opened = BaseCorpus.open(tmp_path / "manuscripts")
+    query = FragmentModel("Query", "A B C D\nG H I J\nK L M", DEFAULT_N_VALUES)
+
+    assert opened.documents.index.equals(manuscripts.documents.index)
+    assert opened.ngrams_by_document.to_list() == (
+        manuscripts.ngrams_by_document.to_list()
+    )
+    assert opened.match(query).equals(manuscripts.match(query))
+
+
+def test_save_manuscripts_stores_chapters_once(tmp_path, metadata_chapter_corpus):
+    metadata_chapter_corpus.manuscripts.save(tmp_path / "manuscripts")
+
+    chapters = (tmp_path / "manuscripts" / "chapters.jsonl").read_text().splitlines()
+    records = (tmp_path / "manuscripts" / "records.jsonl").read_text().splitlines()
+
+    assert [json.loads(chapter) for chapter in chapters] == [
+        chapter.to_record() for chapter in metadata_chapter_corpus
+    ]
+    assert [json.loads(record) for record in records] == [
+        {"chapter": 0, "siglum": "BabOBa"},
+        {"chapter": 0, "siglum": "NinOB"},
+        {"chapter": 0, "siglum": "NinOBSch"},
+        {"chapter": 1, "siglum": "NinOB"},
+        {"chapter": 2, "siglum": "NinOB"},
+    ]
+
+
+def test_open_manuscripts_shares_chapters(
+    tmp_path, metadata_chapter_corpus, monkeypatch
+):
+    manuscripts = metadata_chapter_corpus.manuscripts
+    manuscripts.save(tmp_path / "manuscripts")
+
+    def extract(self):
+        raise AssertionError("n-grams extracted")
+
+    monkeypatch.setattr(ChapterModel, "_extract_keys_by_manuscript", extract)
+    opened = BaseCorpus.open(tmp_path / "manuscripts")
+    chapters = [manuscript.chapter for manuscript in opened.documents]
+
+    assert chapters[0] is chapters[1] is chapters[2]
+    assert len({id(chapter) for chapter in chapters}) == 3
+    assert [chapter.to_record() for chapter in chapters] == [
+        manuscript.chapter.to_record() for manuscript in manuscripts.documents
+    ]
+    assert [chapter.ngrams_by_manuscript for chapter in chapters] == [
+        manuscript.chapter.ngrams_by_manuscript for manuscript in manuscripts.documents
+    ]
+    assert [chapter.ngrams for chapter in chapters] == [
+        manuscript.chapter.ngrams for manuscript in manuscripts.documents
+    ]
+
+
+def test_open_manuscripts_lazy(tmp_path, metadata_chapter_corpus):
+    manuscripts = metadata_chapter_corpus.manuscripts
+    manuscripts.save(tmp_path / "manuscripts")
+
+    opened = BaseCorpus.open(tmp_path / "manuscripts", lazy=True)
+    chapters = [manuscript.chapter for manuscript in opened.documents]
+
+    assert chapters[0] is chapters[1] is chapters[2]
+    assert [manuscript.ngrams for manuscript in opened.documents] == [
+        manuscript.ngrams for manuscript in manuscripts.documents
+    ]
+    assert opened.metadata.equals(manuscripts.metadata)
+    assert opened.where(siglum="NinOB").documents.index.equals(
+        manuscripts.where(siglum="NinOB").documents.index
+    )
+
+    opened.save(tmp_path / "saved")
+    assert (tmp_path / "saved" / "chapters.jsonl").read_text() == (
+        tmp_path / "manuscripts" / "chapters.jsonl"
+    ).read_text()
+
+
+def test_open_manuscripts_without_all_sigla(tmp_path, metadata_chapter_corpus):
+    manuscripts = metadata_chapter_corpus.manuscripts.remove_documents(
+        [("/L/1/2/OB/-", "NinOB")]
+    )
+    manuscripts.save(tmp_path / "manuscripts")
+
+    opened = BaseCorpus.open(tmp_path / "manuscripts")
+    chapter = opened.documents.iloc[0].chapter
+
+    assert set(chapter.keys_by_manuscript) == {"BabOBa", "NinOB", "NinOBSch"}
+    assert opened.ngrams_by_document.to_list() == (
+        manuscripts.ngrams_by_document.to_list()
+    )
@@ -1,5 +1,23 @@
+import pickle
+import numpy as np
+import pandas as pd
 import pytest
 from ebl_ngrams import DEFAULT_N_VALUES, API_URL, FragmentModel, ChapterModel
+from ebl_ngrams.chapter_model import drop_colophon_lines, set_sigla
+from ebl_ngrams.document_model import (
+    extract_keys,
+    ngrams_multi_n,
+    postprocess,
+    preprocess,
+)
+from ebl_ngrams.ngram_keys import (
+    export_keys,
+    filter_keys,
+    import_keys,
+    key_lengths,
+    pack,
+    unpack,
+)
 from tests.test_support import (
     N_VALUES,
     create_multiline_ngrams,
@@ -82,3 +100,130 @@ def test_match(n_values):
 
     assert left.match(right) == right.match(left)
     assert left.match(right) == pytest.approx(shared / max_length)
+
+
+def test_ngram_keys_round_trip(mock_fragment_long):
+    ngrams = mock_fragment_long.ngrams
+
+    assert len(mock_fragment_long.ngram_keys) == len(ngrams)
+    assert unpack(pack(ngrams)) == ngrams
+    assert unpack(import_keys(*export_keys(mock_fragment_long.ngram_keys))) == ngrams
+
+
+MANY_SIGNS = [f"SIGN{i}" for i in range(2000)]
+
+
+@pytest.mark.parametrize(
+    "ngrams",
+    [
+        {tuple("ABCDEFGH"), tuple("ABCDEFG"), tuple("ABCDEFGHIJKLMNOP"), ("A",)},
+        {tuple(MANY_SIGNS[i : i + n]) for n in range(1, 9) for i in range(0, 2000, 7)},
+    ],
+)
+def test_pack_long_ngrams_and_many_signs(ngrams):
+    keys = pack(ngrams)
+
+    assert unpack(keys) == ngrams
+    assert sorted(key_lengths(keys)) == sorted(len(ngram) for ngram in ngrams)
+    assert unpack(import_keys(*export_keys(keys))) == ngrams
+    for n_values in [(1,), (7,), (8, 16), (2, 7, 8)]:
+        assert unpack(filter_keys(keys, n_values)) == {
+            ngram for ngram in ngrams if len(ngram) in n_values
+        }
+
+
+@pytest.mark.parametrize("n_values", [(6,), (7,), (9, 10)])
+def test_long_ngrams_with_many_signs(n_values):
+    signs = " ".join(MANY_SIGNS[:300])
+    fragment = FragmentModel("Many.Signs", signs, n_values)
+
+    assert fragment.ngrams == create_multiline_ngrams(signs, *n_values)
+
+
+def test_document_has_no_dict(mock_fragment):
+    assert not hasattr(mock_fragment, "__dict__")
+
+
+def test_pickle_document(mock_fragment_long):
+    restored = pickle.loads(pickle.dumps(mock_fragment_long))
+
+    assert restored.id_ == mock_fragment_long.id_
+    assert restored.ngrams == mock_fragment_long.ngrams
+    assert restored.ngram_keys.tolist() == mock_fragment_long.ngram_keys.tolist()
+
+
+@pytest.mark.parametrize("n_values", N_VALUES)
+def test_extract_keys(mock_fragment_long, n_values):
+    signs = preprocess(mock_fragment_long.signs)
+
+    assert extract_keys(signs, *n_values).tolist() == (
+        pack(postprocess(ngrams_multi_n(signs, *n_values))).tolist()
+    )
+
+
+def random_chapter_data(seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    signs = []
+    manuscripts = []
+
+    for _ in range(8):
+        lines = int(rng.integers(1, 12))
+        colophon = int(rng.integers(0, lines + 1))
+        signs.append(
+            None
+            if rng.random() < 0.2
+            else "\n".join(
+                sign_factory(int(rng.integers(0, 8)), seed=int(rng.integers(1000)))
+                for _ in range(lines)
+            )
+        )
+        manuscripts.append(
+            {
+                "provenance": rng.choice(["Nineveh", "Babylon", "Uruk"]),
+                "period": "Neo-Assyrian",
+                "type": rng.choice(["Library", "School"]),
+                "siglumDisambiguator": str(rng.integers(1, 4)),
+                "colophon": {"numberOfLines": colophon},
+                "unplacedLines": {
+                    "numberOfLines": int(rng.integers(0, lines - colophon + 1))
+                },
+            }
+        )
+
+    return {
+        "signs": signs,
+        "manuscripts": manuscripts,
+        "textId": {"genre": "L", "category": 1, "index": seed},
+        "stage": "Standard Babylonian",
+        "name": "-",
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chapter_ngrams_match_pandas_pipeline(seed):
+    data = random_chapter_data(seed)
+    expected = (
+        pd.DataFrame({"manuscript": data["manuscripts"], "signs": data["signs"]})
+        .pipe(set_sigla)
+        .pipe(drop_colophon_lines)
+        .groupby(level=0)
+        .agg("\n".join)
+        .map(lambda signs: unpack(extract_keys(preprocess(signs), *DEFAULT_N_VALUES)))
+        .to_dict()
+    )
+
+    assert ChapterModel(data, DEFAULT_N_VALUES).ngrams_by_manuscript == expected
+
+
+@pytest.mark.parametrize(
+    "n_values,contiguous",
+    [((1, 2, 3), True), ((2, 3), True), ((3, 1), False), ((2, 9), True), ((9,), True)],
+)
+def test_filter_keys(n_values, contiguous):
+    keys = pack(create_ngrams(sign_factory(30, seed=1), 1, 2, 3))
+    filtered = filter_keys(keys, n_values)
+
+    assert unpack(filtered) == {
+        ngram for ngram in unpack(keys) if len(ngram) in n_values
+    }
+    assert np.shares_memory(filtered, keys) == (contiguous and len(filtered) > 0)
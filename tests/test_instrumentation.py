@@ -0,0 +1,115 @@
+import json
+import logging
+
+import pytest
+
+from ebl_ngrams import DEFAULT_N_VALUES, FragmentCorpus, FragmentModel
+from ebl_ngrams.instrumentation import (
+    add_listener,
+    collect_stats,
+    enabled,
+    log_events,
+    remove_listener,
+    stage,
+)
+from tests.test_support import sign_factory
+
+FRAGMENTS = [
+    {"_id": f"Random.{i}", "signs": sign_factory(40, seed=i)} for i in range(30)
+]
+
+
+@pytest.fixture
+def corpus():
+    return FragmentCorpus(FRAGMENTS, DEFAULT_N_VALUES)
+
+
+@pytest.fixture
+def query():
+    return FragmentModel("Query", sign_factory(30, seed=1000), DEFAULT_N_VALUES)
+
+
+def test_stage_disabled():
+    assert not enabled()
+    with stage("outer", documents=1) as counts:
+        assert counts is None
+
+
+def test_stage_events():
+    with collect_stats() as stats:
+        assert enabled()
+        with stage("outer", documents=1) as counts:
+            counts["ngrams"] = 2
+            with stage("inner"):
+                pass
+
+    assert not enabled()
+    assert [(event.path, event.counts) for event in stats.events] == [
+        (("outer", "inner"), {}),
+        (("outer",), {"documents": 1, "ngrams": 2}),
+    ]
+    assert all(event.seconds >= 0 for event in stats.events)
+
+
+def test_stage_error():
+    with collect_stats() as stats:
+        with pytest.raises(ValueError):
+            with stage("outer"):
+                raise ValueError()
+        with stage("next"):
+            pass
+
+    assert [event.path for event in stats.events] == [("next",)]
+
+
+@pytest.mark.parametrize("engine", ["sets", "sparse", "index"])
+def test_match_stages(corpus, query, engine):
+    corpus.inverted_index
+    with collect_stats() as stats:
+        corpus.match(query, engine=engine)
+
+    summary = stats.summary()
+    assert {"match", "match/intersect"} <= set(summary.index)
+    assert summary.loc["match", "calls"] == 1
+    assert summary.loc["match", "documents"] == len(corpus)
+    if engine == "index":
+        assert summary.loc["match/intersect", "postings"] > 0
+
+
+def test_corpus_match_stages(corpus):
+    with collect_stats() as stats:
+        corpus.match(corpus, engine="sparse")
+        corpus.match_tf_idf(corpus)
+
+    summary = stats.summary()
+    assert {
+        "match/build_matrix",
+        "match/encode",
+        "match/intersect",
+        "match_tf_idf/encode",
+        "match_tf_idf/intersect",
+    } <= set(summary.index)
+    assert summary.loc["match", "queries"] == len(corpus)
+
+
+def test_build_stage():
+    with collect_stats() as stats:
+        FragmentCorpus(FRAGMENTS, DEFAULT_N_VALUES)
+
+    assert [event.counts for event in stats.events if event.name == "build"] == [
+        {"workers": 1, "documents": len(FRAGMENTS)}
+    ]
+
+
+def test_log_events(caplog, corpus, query):
+    listener = add_listener(log_events())
+    try:
+        with caplog.at_level(logging.INFO, logger="ebl_ngrams"):
+            corpus.match(query, engine="sparse")
+    finally:
+        remove_listener(listener)
+
+    records = [json.loads(record.getMessage()) for record in caplog.records]
+    assert records[-1]["path"] == "match"
+    assert records[-1]["counts"]["engine"] == "sparse"
+    assert caplog.records[-1].ebl_ngrams == records[-1]
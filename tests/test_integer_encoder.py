@@ -0,0 +1,139 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from ebl_ngrams.integer_encoder import MIN_TAIL, UNKNOWN, IntegerEncoder
+from ebl_ngrams.ngram_keys import KEY_DTYPE, pack, unpack
+from tests.test_support import run_in_new_process
+
+KEYS = np.array([30, 10, 20], dtype=KEY_DTYPE)
+
+
+def test_init_deduplicates():
+    encoder = IntegerEncoder([30, 10, 20, 10])
+
+    assert encoder.vocabulary == [10, 20, 30]
+    assert len(encoder) == 3
+
+
+def test_from_vocabulary_keeps_order():
+    encoder = IntegerEncoder.from_vocabulary(KEYS)
+
+    assert encoder.vocabulary == KEYS.tolist()
+    assert [encoder.encode(key) for key in KEYS.tolist()] == [0, 1, 2]
+    assert [encoder.decode(id_) for id_ in range(3)] == KEYS.tolist()
+
+
+def test_unknown():
+    encoder = IntegerEncoder.from_vocabulary(KEYS)
+
+    assert 40 not in encoder
+    with pytest.raises(KeyError):
+        encoder.encode(40)
+    with pytest.raises(KeyError):
+        encoder.decode(3)
+
+
+def test_encode_array():
+    encoder = IntegerEncoder.from_vocabulary(KEYS)
+    ids = encoder.encode_array(np.array([20, 40, 30, 5], dtype=KEY_DTYPE))
+
+    assert ids.tolist() == [2, UNKNOWN, 0, UNKNOWN]
+    assert encoder.decode_array(np.array([2, 0])).tolist() == [20, 30]
+
+
+@pytest.mark.parametrize("size", [10, MIN_TAIL * 3])
+def test_add_item(size):
+    encoder = IntegerEncoder()
+    items = np.random.default_rng(size).permutation(size * 10)[:size]
+    for item in items.tolist():
+        encoder.add_item(item)
+        encoder.add_item(item)
+
+    assert encoder.vocabulary == items.tolist()
+    assert encoder.encode_array(items).tolist() == list(range(size))
+    assert encoder.encode_array(np.array([size * 10])).tolist() == [UNKNOWN]
+
+
+def test_update():
+    encoder = IntegerEncoder.from_vocabulary(KEYS)
+    encoder.add_item(25)
+    encoder.update(np.array([40, 20, 25, 15], dtype=KEY_DTYPE))
+
+    assert encoder.vocabulary == [30, 10, 20, 25, 15, 40]
+    assert encoder.encode(40) == 5
+
+
+def test_keys_are_read_only():
+    encoder = IntegerEncoder(KEYS)
+
+    with pytest.raises(ValueError):
+        encoder.keys[0] = 1
+
+
+def test_frozen():
+    encoder = IntegerEncoder(KEYS).freeze()
+
+    with pytest.raises(ValueError, match="frozen"):
+        encoder.add_item(40)
+    with pytest.raises(ValueError, match="frozen"):
+        encoder.update([40])
+    assert encoder.encode_array(np.array([40, 10])).tolist() == [UNKNOWN, 0]
+
+
+NGRAMS = [("A", "B"), ("C",), tuple("ABCDEFGH"), ("B", "A")]
+
+LOAD_ENCODER = """
+import json, pickle, sys
+from ebl_ngrams.ngram_keys import pack, unpack
+
+pack({("Z", "Y", "C", "B", "A")})
+with open(sys.argv[1], "rb") as pickled:
+    encoder = pickle.load(pickled)
+print(json.dumps([
+    [encoder.encode(tuple(ngram)) for ngram in json.loads(sys.argv[2])],
+    [list(*unpack(encoder.keys[id_ : id_ + 1])) for id_ in range(len(encoder))],
+]))
+"""
+
+
+@pytest.mark.parametrize("frozen", [False, True])
+def test_pickle(frozen):
+    encoder = IntegerEncoder.from_vocabulary(NGRAMS[:3])
+    encoder.add_item(NGRAMS[3])
+    if frozen:
+        encoder.freeze()
+
+    loaded = pickle.loads(pickle.dumps(encoder))
+
+    assert loaded.vocabulary == encoder.vocabulary
+    assert loaded.frozen == frozen
+    assert loaded.encode(("B", "A")) == 3
+
+
+def test_pickle_in_new_process(tmp_path):
+    encoder = IntegerEncoder.from_vocabulary(NGRAMS)
+    (tmp_path / "encoder.pkl").write_bytes(pickle.dumps(encoder))
+
+    ids, vocabulary = json.loads(
+        run_in_new_process(
+            LOAD_ENCODER, str(tmp_path / "encoder.pkl"), json.dumps(NGRAMS)
+        )
+    )
+
+    assert ids == [0, 1, 2, 3]
+    assert vocabulary == [list(ngram) for ngram in NGRAMS]
+
+
+def test_ngram_tuples():
+    encoder = IntegerEncoder([("A", "B"), ("C",), tuple("ABCDEFGH")])
+
+    assert len(encoder) == 3
+    assert ("A", "B") in encoder
+    assert ("B", "A") not in encoder
+    assert unpack(encoder.decode_array(np.array([encoder.encode(("C",))]))) == {("C",)}
+    assert encoder.encode(tuple("ABCDEFGH")) == encoder.encode(
+        pack({tuple("ABCDEFGH")})[0]
+    )
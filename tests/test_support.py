@@ -1,11 +1,12 @@
 from itertools import tee
 import numpy as np
 import re
+import subprocess
+import sys
 from typing import Sequence
 
 from ebl_ngrams.document_model import UNKNOWN_SIGN, NGramSet
 
-
 N_VALUES = [
     [1],
     [1, 2],
@@ -53,3 +54,12 @@ def create_multiline_ngrams(signs: str, *n) -> NGramSet:
         ngram
         for ngram in create_ngrams(re.sub(r"\n+", " #\n", signs).rstrip(" \n#"), *n)
     }
+
+
+def run_in_new_process(script: str, *args: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", script, *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout